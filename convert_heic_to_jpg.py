@@ -0,0 +1,127 @@
+"""
+HEIC to JPG conversion, with `heif-convert` processes running in parallel.
+
+This converts all .HEIC (case insensitive) files in a given directory to .jpg format.
+- Without a prefix, each file is converted to the same name with .jpg,
+  and the original .HEIC files are kept.
+- With a prefix, the converted files are renamed using the format:
+  <prefix>_00001.jpg, <prefix>_00002.jpg, etc.
+  The numbers are assigned from the sorted input filenames before any conversion starts,
+  so they don't depend on which conversion finishes first.
+  WARNING: the original .HEIC files are deleted after their output is verified.
+
+Each file is converted to a temporary file, which is checked to be a complete JPEG
+and then moved to the output name, so an interrupted run never leaves a broken .jpg
+behind, and an original is never deleted without a valid output.
+
+Usage:
+    python convert_heic_to_jpg.py <directory> [prefix] [-w WORKERS]
+
+Example:
+    python convert_heic_to_jpg.py /path/to/images vacation
+    This converts and renames images like vacation_00001.jpg, vacation_00002.jpg, etc.
+
+Requirements:
+    heif-convert utility (install with 'sudo apt install libheif-examples' on Ubuntu
+    or 'brew install libheif' on macOS).
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Convert .HEIC files in a directory to .jpg in parallel.")
+    parser.add_argument("directory", type=str)
+    parser.add_argument("prefix", type=str, nargs="?", default=None,
+                        help="If set, rename outputs to <prefix>_00001.jpg, ... "
+                        "and delete the original .HEIC files.")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="Number of heif-convert processes running at the same time.")
+    parser.add_argument("-q", "--quality", type=int, default=None,
+                        help="JPEG quality passed to heif-convert.")
+    return parser.parse_args()
+
+
+def list_heic_files(directory):
+    """Return the sorted paths of .heic files (case insensitive) in the directory."""
+    with os.scandir(directory) as entries:
+        return sorted(entry.path for entry in entries
+                      if entry.is_file() and entry.name.lower().endswith(".heic"))
+
+
+def plan_outputs(heic_files, directory, prefix=None):
+    """Return [(heic_file, jpg_file)], numbered in the order of heic_files if prefix is set."""
+    if prefix is None:
+        return [(file, os.path.splitext(file)[0] + ".jpg") for file in heic_files]
+    return [(file, os.path.join(directory, f"{prefix}_{i:05d}.jpg"))
+            for i, file in enumerate(heic_files, start=1)]
+
+
+def is_valid_jpeg(filename):
+    """Check the JPEG start-of-image and end-of-image markers."""
+    if not os.path.isfile(filename) or os.path.getsize(filename) < 4:
+        return False
+    with open(filename, "rb") as f:
+        head = f.read(2)
+        f.seek(-2, os.SEEK_END)
+        tail = f.read(2)
+    return head == b"\xff\xd8" and tail == b"\xff\xd9"
+
+
+def convert(heic_file, jpg_file, quality=None):
+    """Convert one file through a temporary file. Return an error message, or None."""
+    # heif-convert picks the output format by the extension, so keep .jpg at the end.
+    tmp_file = os.path.join(os.path.dirname(jpg_file),
+                            f".{os.path.basename(jpg_file)}.tmp.jpg")
+    args = ["heif-convert"]
+    if quality is not None:
+        args += ["-q", str(quality)]
+    result = subprocess.run(args + [heic_file, tmp_file],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0 or not is_valid_jpeg(tmp_file):
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        return result.stderr.decode(errors="replace").strip() or "invalid output"
+    os.replace(tmp_file, jpg_file)
+    return None
+
+
+def convert_heic_to_jpg(directory, prefix=None, workers=None, quality=None):
+    jobs = plan_outputs(list_heic_files(directory), directory, prefix)
+    cnt_failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(convert, heic_file, jpg_file, quality)
+                   for heic_file, jpg_file in jobs]
+        for (heic_file, jpg_file), future in zip(jobs, futures):
+            error = future.result()
+            if error is not None:
+                cnt_failed += 1
+                print(f"Failed to convert {heic_file}: {error}")
+                continue
+            print(f"Successfully converted {heic_file} to {jpg_file}")
+            if prefix is not None:
+                # Delete the original file after its output is verified
+                os.remove(heic_file)
+                print(f"Deleted original file: {heic_file}")
+    return len(jobs), cnt_failed
+
+
+def main():
+    args = parse_args()
+    if not os.path.isdir(args.directory):
+        print(f"Directory not found: {args.directory}")
+        sys.exit(1)
+    num_files, cnt_failed = convert_heic_to_jpg(
+        args.directory, args.prefix, args.workers, args.quality)
+    print(f"Conversion complete: {num_files} files, {cnt_failed} failed.")
+    if cnt_failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
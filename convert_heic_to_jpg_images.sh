@@ -14,12 +14,6 @@ if [ ! -d "$DIR" ]; then
     exit 1
 fi
 
-# Convert all HEIC files to JPG
-for file in "$DIR"/*.HEIC; do
-    if [ -f "$file" ]; then
-        echo "Converting $file ..."
-        heif-convert "$file" "${file%.HEIC}.jpg"
-    fi
-done
-
-echo "Conversion complete."
+# Convert all HEIC files to JPG, in parallel.
+# The original .HEIC files are kept.
+exec python3 "$(dirname "$0")/convert_heic_to_jpg.py" "$DIR"
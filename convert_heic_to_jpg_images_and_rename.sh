@@ -4,8 +4,9 @@
 # 
 # This script converts all .HEIC (case insensitive) files in a given directory to .jpg format.
 # The converted files are renamed using the format: <prefix>_00001.jpg, <prefix>_00002.jpg, etc.
-# After successful conversion.
-# WARNING: the original .HEIC files are deleted.
+# The numbers follow the sorted filenames, and are assigned before the conversions,
+# which run in parallel (see convert_heic_to_jpg.py).
+# WARNING: the original .HEIC files are deleted after their output is verified.
 #
 # Usage:
 #   ./heic_to_jpg.sh <directory> <prefix>
@@ -33,36 +34,4 @@ if [ ! -d "$DIR" ]; then
     exit 1
 fi
 
-# Enable case-insensitive globbing for file extensions
-shopt -s nullglob nocaseglob
-
-# Find and sort the HEIC files by name
-files=("$DIR"/*.heic "$DIR"/*.HEIC)
-sorted_files=($(printf "%s\n" "${files[@]}" | sort))
-
-# Initialize the counter
-counter=1
-
-# Convert and rename all HEIC files
-for file in "${sorted_files[@]}"; do
-    if [ -f "$file" ]; then
-        echo "Converting $file ..."
-        new_filename=$(printf "%s/%s_%05d.jpg" "$DIR" "$PREFIX" "$counter")
-        
-        # Convert HEIC to JPG and rename
-        if heif-convert "$file" "$new_filename"; then
-            echo "Successfully converted and renamed to $new_filename"
-            
-            # Delete the original file after successful conversion
-            rm "$file"
-            echo "Deleted original file: $file"
-        else
-            echo "Failed to convert $file"
-        fi
-        
-        # Increment the counter
-        ((counter++))
-    fi
-done
-
-echo "Conversion, renaming, and cleanup complete."
+exec python3 "$(dirname "$0")/convert_heic_to_jpg.py" "$DIR" "$PREFIX"
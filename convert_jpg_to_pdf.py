@@ -1,25 +1,164 @@
+"""
+Convert JPG images to PDF.
+
+Two modes:
+    1. One PDF per JPG (default). The files are converted on a pool of processes.
+    2. --merge: Write all JPGs into one multi-page PDF, one page per image.
+       Images from folders are sorted by name; files given explicitly keep their order.
+
+The JPEG bytes are embedded into the PDF as they are (DCTDecode), without decoding
+and re-encoding, and each page is written to the file as soon as it is read,
+so the memory stays constant. Only JPEGs that can't be embedded directly (e.g. CMYK)
+are decoded and re-encoded as RGB by PIL.
+
+Usage:
+    python convert_jpg_to_pdf.py /home/feiyu/Downloads/photos/
+    python convert_jpg_to_pdf.py /home/feiyu/Downloads/photos/ --merge photos.pdf
+    python convert_jpg_to_pdf.py 1.jpg 3.jpg 2.jpg --merge out.pdf
+"""
+
+import argparse
+import io
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count
+
 from PIL import Image
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "old-2019"))
+from include.lib_images import read_jpeg_header
+
 dir = "/home/feiyu/Downloads/photos/"
 
-def convert_images_to_pdf(directory):
-    # Change the current directory to the given directory
-    os.chdir(directory)
-
-    # Iterate over all the files in the directory
-    for file in os.listdir(directory):
-        # Check if the file is a JPG image
-        if file.lower().endswith('.jpg'):
-            # Open the image using PIL
-            image = Image.open(file)
-            # Converting the image to RGB mode if it's not (required for conversion)
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            # Define the PDF filename based on the JPG filename
-            pdf_filename = f"{os.path.splitext(file)[0]}.pdf"
-            # Save the image as a PDF
-            image.save(pdf_filename)
+COLOR_SPACES = {1: "/DeviceGray", 3: "/DeviceRGB"}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert JPG images to PDF.")
+    parser.add_argument("inputs", type=str, nargs="*", default=[dir],
+                        help="Folders of JPGs, or JPG files. Default: " + dir)
+    parser.add_argument("-m", "--merge", type=str, default=None,
+                        help="Write all images into this one multi-page PDF.")
+    parser.add_argument("-w", "--workers", type=int, default=cpu_count(),
+                        help="Number of processes for one PDF per JPG.")
+    return parser.parse_args()
+
+
+def list_jpgs(inputs):
+    """Expand folders into their sorted JPG files."""
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, file) for file in os.listdir(path)
+                                if file.lower().endswith('.jpg')))
+        else:
+            files.append(path)
+    return files
+
+
+def load_jpeg(file):
+    """Return (jpeg bytes, width, height, components) which can be embedded into a PDF.
+    JPEGs which can't be embedded as they are, or whose header can't be parsed,
+    are re-encoded as RGB."""
+    header = read_jpeg_header(file)
+    with open(file, 'rb') as f:
+        data = f.read()
+    if header is not None and header[2] in COLOR_SPACES:
+        height, width, components = header
+        return data, width, height, components
+    with Image.open(io.BytesIO(data)) as image:
+        # Converting the image to RGB mode if it's not (required for conversion)
+        image = image.convert('RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=95)
+        return buffer.getvalue(), image.width, image.height, 3
+
+
+class PdfWriter:
+    """Write JPEG pages to a PDF file one by one.
+    Objects 1 and 2 are reserved for the catalog and the page tree,
+    which are written last, once all pages are known."""
+
+    def __init__(self, pdf_filename):
+        self.file = open(pdf_filename, 'wb')
+        self.file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self.offsets = {}
+        self.next_id = 3
+        self.page_ids = []
+
+    def _write_object(self, obj_id, body, stream=None):
+        self.offsets[obj_id] = self.file.tell()
+        self.file.write(f"{obj_id} 0 obj\n".encode() + body)
+        if stream is not None:
+            self.file.write(b'\nstream\n' + stream + b'\nendstream')
+        self.file.write(b'\nendobj\n')
+
+    def _new_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def add_jpeg_page(self, data, width, height, components):
+        """Add a page of width x height points showing the JPEG (72 dpi, same as PIL)."""
+        image_id, content_id, page_id = self._new_id(), self._new_id(), self._new_id()
+        self._write_object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace {COLOR_SPACES[components]} /BitsPerComponent 8 "
+            f"/Filter /DCTDecode /Length {len(data)} >>").encode(), data)
+        content = f"q {width} 0 0 {height} 0 0 cm /Im0 Do Q".encode()
+        self._write_object(content_id, f"<< /Length {len(content)} >>".encode(), content)
+        self._write_object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> "
+            f"/Contents {content_id} 0 R >>").encode())
+        self.page_ids.append(page_id)
+
+    def close(self):
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode())
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref_offset = self.file.tell()
+        self.file.write(f"xref\n0 {self.next_id}\n0000000000 65535 f \n".encode())
+        for obj_id in range(1, self.next_id):
+            self.file.write(f"{self.offsets[obj_id]:010d} 00000 n \n".encode())
+        self.file.write((f"trailer\n<< /Size {self.next_id} /Root 1 0 R >>\n"
+                         f"startxref\n{xref_offset}\n%%EOF\n").encode())
+        self.file.close()
+
+
+def convert_image_to_pdf(file):
+    """Save one JPG as a one-page PDF next to it."""
+    # Define the PDF filename based on the JPG filename
+    pdf_filename = f"{os.path.splitext(file)[0]}.pdf"
+    writer = PdfWriter(pdf_filename)
+    writer.add_jpeg_page(*load_jpeg(file))
+    writer.close()
+    return pdf_filename
+
+
+def convert_images_to_pdf(files, workers=None):
+    """Convert each JPG to its own PDF on a pool of processes."""
+    with ProcessPoolExecutor(max_workers=workers or cpu_count()) as pool:
+        for file, pdf_filename in zip(files, pool.map(convert_image_to_pdf, files)):
             print(f"Converted {file} to {pdf_filename}")
 
-convert_images_to_pdf(dir)
+
+def merge_images_to_pdf(files, pdf_filename):
+    """Write all JPGs into one PDF, one page per image, in the given order."""
+    writer = PdfWriter(pdf_filename)
+    try:
+        for i, file in enumerate(files):
+            writer.add_jpeg_page(*load_jpeg(file))
+            print(f"{i + 1}/{len(files)}: Added {file}")
+    finally:
+        writer.close()
+    print(f"Saved {len(files)} pages to {pdf_filename}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    files = list_jpgs(args.inputs)
+    if args.merge:
+        merge_images_to_pdf(files, args.merge)
+    else:
+        convert_images_to_pdf(files, args.workers)
@@ -0,0 +1,81 @@
+"""
+Remove images' metadata and set new dates in the order of their original creation time.
+
+1. Extracts the 'DateTimeOriginal' metadata from the image files and sorts them based on this timestamp.
+2. Removes all metadata from the images except for the orientation information,
+   which preserves the correct image rotation.
+3. Sets a new 'DateTimeOriginal' and 'FileModifyDate' timestamp for each image,
+   starting from the current time for the first image,
+   and incrementing each subsequent image by 1 millisecond.
+4. Renames the image files based on their new timestamps in the format 'MM-DD-HH-MM-SS'.
+5. Moves the processed images into a subdirectory named "result" within the specified folder.
+6. Handles potential duplicate filenames by appending a numerical suffix to ensure uniqueness.
+7. Filters and processes only valid image files (JPEG, PNG, TIFF) and skips other files.
+The metadata is read and written by a pool of persistent exiftool processes.
+
+Usage:
+    python rename_files_with_image_creation_time_and_then_reset_creation_time.py <folder_path>
+
+Requirements:
+    exiftool must be installed and accessible in the system's PATH.
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from lib_exiftool import STRIP_ARGS, ExifToolPool
+from rename_files_with_image_creation_time import (
+    get_image_mime_type, get_unique_filename, list_images)
+
+
+def reset_creation_time(folder_path, exiftool_pool):
+    result_folder = os.path.join(folder_path, "result")
+    os.makedirs(result_folder, exist_ok=True)
+    current_time_ms = int(time.time()) * 1000
+
+    # Sort the images by DateTimeOriginal
+    filepaths = [os.path.join(folder_path, filename) for filename in list_images(folder_path)]
+    dates = exiftool_pool.read_dates(filepaths, ["DateTimeOriginal"])
+    filepaths = [filepath for filepath in filepaths if "DateTimeOriginal" in dates[filepath]]
+    if not filepaths:
+        print(f"No image files with 'DateTimeOriginal' metadata found in '{folder_path}'.")
+        return
+    filepaths.sort(key=lambda filepath: (dates[filepath]["DateTimeOriginal"], filepath))
+
+    # Give each image 1 ms more than the previous one
+    new_dates = {}
+    for filepath in filepaths:
+        mime_type = get_image_mime_type(filepath)
+        if mime_type is None:
+            print(f"Skipping invalid or unsupported file: '{os.path.basename(filepath)}'")
+            continue
+        timestamp_ms = current_time_ms + len(new_dates)
+        new_dates[filepath] = datetime.fromtimestamp(timestamp_ms // 1000)
+
+    # Keep the orientation, set the new timestamp, and remove any unique identifiers
+    exiftool_pool.write_dates(
+        new_dates, ["FileModifyDate", "DateTimeOriginal", "CreationDate"], STRIP_ARGS)
+
+    # Move the files to the result folder with the new names
+    for filepath, date in new_dates.items():
+        extension = filepath.rsplit(".", 1)[-1].lower()
+        new_filename = get_unique_filename(
+            result_folder, date.strftime("%m-%d-%H-%M-%S"), extension)
+        os.rename(filepath, os.path.join(result_folder, new_filename))
+
+    print("Processed images with updated timestamps, removed unique identifiers, and renamed files.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(f"Usage: {sys.argv[0]} <folder_path>")
+        sys.exit(1)
+    folder_path = sys.argv[1]
+    if not os.path.isdir(folder_path):
+        print(f"Error: '{folder_path}' is not a directory")
+        sys.exit(1)
+    with ExifToolPool() as exiftool_pool:
+        reset_creation_time(folder_path, exiftool_pool)
@@ -12,3 +12,9 @@ cp /home/feiyu/Downloads/4/* /home/feiyu/Downloads/汇总/
 /home/feiyu/workplace/scripts/rename_files_with_image_creation_time.sh /home/feiyu/Downloads/汇总
 
 /home/feiyu/workplace/scripts/set_dummy_date_for_sorted_image_files.sh /home/feiyu/Downloads/汇总
+
+# Or, all the above steps, redoing only the new or changed files when it's run again:
+python3 /home/feiyu/workplace/scripts/photo_pipeline.py /home/feiyu/Downloads/汇总 \
+    -s /home/feiyu/Downloads/1 day_1_2_ \
+    -s /home/feiyu/Downloads/3 day_3_ \
+    -s /home/feiyu/Downloads/4 day_4_5_
@@ -0,0 +1,72 @@
+'''
+Function:
+    Benchmark the point cloud filters in include/lib_point_cloud.py:
+    the per-point `criteria(x, y, z)` loop vs. the vectorized CloudFilter masks.
+
+Example of usage:
+    python benchmark_filt_cloud.py --num-points 1000000
+
+Dependencies:
+    $ pip install --user open3d-python
+'''
+
+import numpy as np
+import time
+import argparse
+import include.lib_point_cloud as lib_cloud
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark point cloud filters (points/sec).")
+    parser.add_argument("-n", "--num-points", type=int, required=False,
+                        default=1000000)
+    parser.add_argument("--num-points-slow", type=int, required=False,
+                        default=100000,
+                        help="The slow per-point loop only runs on this many points.")
+    args = parser.parse_args()
+    return args
+
+
+def create_random_cloud(num_points):
+    xyz = np.random.uniform(-1.0, 1.0, (num_points, 3))
+    rgb = np.random.uniform(0.0, 1.0, (num_points, 3))
+    return lib_cloud.form_cloud(xyz, rgb)
+
+
+def time_filter(cloud, criteria, repeat=3):
+    ''' Return the best (points/sec, number of kept points) of `repeat` runs. '''
+    num_points = lib_cloud.get_cloud_size(cloud)
+    best = None
+    for i in range(repeat):
+        t0 = time.time()
+        res = lib_cloud.filt_cloud(cloud, criteria)
+        dt = time.time() - t0
+        best = dt if best is None else min(best, dt)
+    return num_points / max(best, 1e-9), lib_cloud.get_cloud_size(res)
+
+
+def main(args):
+    cloud_slow = create_random_cloud(args.num_points_slow)
+    cloud_fast = create_random_cloud(args.num_points)
+
+    def criteria(x, y, z): return \
+        x >= -0.5 and x <= 0.5 and y >= -0.5 and y <= 0.5 and z >= 0 and z <= 1.0
+    range_filter = lib_cloud.RangeFilter(-0.5, 0.5, -0.5, 0.5, 0, 1.0)
+    tote_filter = lib_cloud.OrientedBoxFilter(np.identity(4), (0.6, 0.4, 0.3)) \
+        & ~lib_cloud.SphereFilter((0, 0, 0), 0.1)
+
+    tests = [
+        ("callable criteria (slow)", cloud_slow, criteria, 1),
+        ("RangeFilter", cloud_fast, range_filter, 3),
+        ("OrientedBoxFilter & ~SphereFilter", cloud_fast, tote_filter, 3),
+    ]
+    for name, cloud, f, repeat in tests:
+        pts_per_sec, num_kept = time_filter(cloud, f, repeat)
+        print("{:<36s}: {:>14,.0f} points/sec ({} points in, {} kept)".format(
+            name, pts_per_sec, lib_cloud.get_cloud_size(cloud), num_kept))
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args)
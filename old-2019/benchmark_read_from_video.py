@@ -0,0 +1,90 @@
+'''
+Function:
+    Benchmark the frame sampling of ReadFromVideo in video2images.py:
+    (1) skip frames by grab() vs. by seeking, for different sample intervals.
+    (2) start at a late time by decoding all frames before it vs. by seeking.
+    The speed is the number of sampled frames returned per second.
+
+Example of usage:
+    python benchmark_read_from_video.py \
+        -i /home/feiyu/Desktop/learn_coding/test_data/long_video.avi \
+        --sample_intervals 1 5 30 100 300 \
+        --start_times 60 600
+'''
+
+import time
+import argparse
+from video2images import ReadFromVideo
+
+NEVER_SEEK = 10**9
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark ReadFromVideo (frames/sec).")
+    parser.add_argument("-i", "--input_video_path", type=str, required=True)
+    parser.add_argument("-s", "--sample_intervals", type=int, nargs="+",
+                        required=False, default=[1, 5, 30, 100, 300])
+    parser.add_argument("-t", "--start_times", type=float, nargs="+",
+                        required=False, default=[60.0, 600.0],
+                        help="Start times in seconds.")
+    parser.add_argument("-m", "--max_frames", type=int, required=False,
+                        default=100,
+                        help="Number of sampled frames to read in each test. Default 100.")
+    args = parser.parse_args()
+    return args
+
+
+def read_frames(reader, max_frames):
+    ''' Read at most max_frames sampled frames. Return (frames, seconds). '''
+    cnt = 0
+    t0 = time.time()
+    while reader.has_image() and cnt < max_frames:
+        reader.read_image()
+        cnt += 1
+    return cnt, time.time() - t0
+
+
+def benchmark_sample_intervals(args):
+    print("Sample interval: grab vs. seek")
+    for interval in args.sample_intervals:
+        res = []
+        for seek_threshold in [NEVER_SEEK, 1]:
+            reader = ReadFromVideo(
+                args.input_video_path, interval, seek_threshold)
+            cnt, dt = read_frames(reader, args.max_frames)
+            reader.stop()
+            res.append(cnt / max(dt, 1e-9))
+        print("  interval {:>5d}: grab {:>9.1f} frames/sec, seek {:>9.1f} frames/sec".format(
+            interval, res[0], res[1]))
+
+
+def benchmark_start_times(args):
+    print("Start time: decode all frames before it vs. seek")
+    for start_time in args.start_times:
+
+        # Decode and drop frames until start_time, as video2gif.py used to do
+        reader = ReadFromVideo(args.input_video_path, 1, NEVER_SEEK)
+        t0 = time.time()
+        while reader.has_image() and reader.get_curr_video_time() < start_time:
+            reader.read_image()
+        cnt, dt = read_frames(reader, args.max_frames)
+        t_decode = time.time() - t0
+        reader.stop()
+
+        # Seek to start_time
+        reader = ReadFromVideo(args.input_video_path, 1, NEVER_SEEK)
+        t0 = time.time()
+        reader.seek_to_time(start_time)
+        cnt, dt = read_frames(reader, args.max_frames)
+        t_seek = time.time() - t0
+        reader.stop()
+
+        print("  start {:>8.1f}s: decode {:>9.1f} frames/sec, seek {:>9.1f} frames/sec".format(
+            start_time, cnt / max(t_decode, 1e-9), cnt / max(t_seek, 1e-9)))
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    benchmark_sample_intervals(args)
+    benchmark_start_times(args)
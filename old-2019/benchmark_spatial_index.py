@@ -0,0 +1,103 @@
+'''
+Function:
+    Benchmark the spatial index in include/lib_spatial_index.py on a tote-sized cloud:
+    building, radius and k-NN queries, outlier removal, and incremental insertion,
+    for the kdtree (if scipy is installed) and the voxel hash backends,
+    compared with the O(N^2) brute force search.
+
+Example of usage:
+    python benchmark_spatial_index.py --num-points 1000000
+
+Dependencies:
+    $ pip install --user open3d-python
+    $ pip install --user scipy  # Optional, for the kdtree backend
+'''
+
+import numpy as np
+import time
+import argparse
+import include.lib_spatial_index as lib_spatial_index
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the spatial index (queries/sec).")
+    parser.add_argument("-n", "--num-points", type=int, required=False,
+                        default=1000000)
+    parser.add_argument("-r", "--radius", type=float, required=False,
+                        default=0.005)
+    parser.add_argument("-k", "--k", type=int, required=False,
+                        default=8)
+    parser.add_argument("--num-queries-slow", type=int, required=False,
+                        default=200,
+                        help="The brute force search only runs on this many queries.")
+    args = parser.parse_args()
+    return args
+
+
+def create_tote_cloud(num_points):
+    ''' Points on the bottom and the 4 sides of a 0.6 x 0.4 x 0.3 tote, with noise. '''
+    size = np.array([0.6, 0.4, 0.3])
+    xyz = np.random.uniform(0.0, 1.0, (num_points, 3)) * size
+    face = np.random.randint(0, 5, num_points)
+    xyz[face == 0, 2] = 0
+    xyz[face == 1, 0] = 0
+    xyz[face == 2, 0] = size[0]
+    xyz[face == 3, 1] = 0
+    xyz[face == 4, 1] = size[1]
+    return xyz + np.random.normal(0, 0.0005, xyz.shape)
+
+
+def timeit(name, func, num_items):
+    t0 = time.time()
+    res = func()
+    dt = time.time() - t0
+    print("  {:<32s}: {:>8.3f} s, {:>14,.0f} per sec".format(
+        name, dt, num_items / max(dt, 1e-9)))
+    return res
+
+
+def main(args):
+    xyz = create_tote_cloud(args.num_points)
+    n = xyz.shape[0]
+    queries_knn = xyz[np.random.choice(n, min(n, 100000), replace=False)]
+
+    print("brute force ({} queries):".format(args.num_queries_slow))
+    slow_queries = xyz[:args.num_queries_slow]
+
+    def brute_force():
+        for q in slow_queries:
+            d = np.linalg.norm(xyz - q, axis=1)
+            np.argpartition(d, args.k)[:args.k]
+    timeit("k-NN", brute_force, args.num_queries_slow)
+
+    backends = ["voxel"]
+    if lib_spatial_index.cKDTree is not None:
+        backends.insert(0, "kdtree")
+    for backend in backends:
+        print("{} ({:,} points, radius {}, k {}):".format(backend, n, args.radius, args.k))
+        index = timeit("build", lambda: lib_spatial_index.SpatialIndex(
+            xyz, cell_size=args.radius, backend=backend), n)
+        timeit("count_radius, all points", lambda: index.count_radius(xyz, args.radius), n)
+        timeit("query_radius, 100k points",
+               lambda: index.query_radius(queries_knn, args.radius), queries_knn.shape[0])
+        timeit("query_knn, 100k points",
+               lambda: index.query_knn(queries_knn, args.k), queries_knn.shape[0])
+        mask = timeit("radius outlier removal", lambda: lib_spatial_index.remove_radius_outliers(
+            xyz, args.radius, 2, index=index), n)
+        print("  {:<32s}: {} of {} points".format("inliers", mask.sum(), n))
+        mask = timeit("statistical outlier removal", lambda: lib_spatial_index.remove_statistical_outliers(
+            xyz, args.k, 2.0, index=index), n)
+        print("  {:<32s}: {} of {} points".format("inliers", mask.sum(), n))
+
+        def insert_frames():
+            index = lib_spatial_index.SpatialIndex(cell_size=args.radius, backend=backend)
+            for frame in np.array_split(xyz, 10):
+                index.insert(frame)
+            return index
+        timeit("insert 10 frames", insert_frames, n)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args)
@@ -23,6 +23,26 @@ Usage of this script:
     and then create its copy or softlink in `output-dir\'. 
     - Example usage: $ python convert_timestamp.py -i log -o log_timestamped --method copy
     - Example usage: $ python convert_timestamp.py -i log -o log_timestamped --method link
+    Links are created in-process, and copies run on a pool of threads
+    (using reflink or copy_file_range when the file system supports them).
+    Files/folders which already exist in `output-dir\` are skipped,
+    so running it again only processes the new log folders.
+    With `--method copy --watch`, a log folder is only copied after none of its files
+    has changed for `--settle` seconds (30 by default), so a folder still being recorded
+    isn't copied half way. Without `--watch`, everything is copied at once unless `--settle` is given.
+    - Example usage: $ python convert_timestamp.py -i log -o log_timestamped --watch 10
+      (Check for new log folders every 10 seconds, until Ctrl+C.
+      The log folders still being recorded are checked again every 10 seconds.)
+
+4. Find the log folders near a time, or in a time range
+    The timestamps of the log folders are kept in a sorted index
+    (in `~/.cache/convert_timestamp/`, or set by `--index-path`),
+    which is updated with only the new folders whenever the log-dir has changed,
+    and searched by bisection. If the index can't be saved, it's only kept in memory.
+    - Example usage: $ python convert_timestamp.py -i log -q '2019-08-09 17:20:32' --within 30
+      (The log folders within 30 seconds of the time.)
+    - Example usage: $ python convert_timestamp.py -i log -q '2019-08-09 17:00:00' --until '2019-08-09 18:00:00'
+      (The log folders in the time range.)
 
 A detailed explanation of the arguments can be viewed by running:
 $ python convert_timestamp.py -h
@@ -31,12 +51,24 @@ $ python convert_timestamp.py -h
 import sys
 import time
 from datetime import datetime, timedelta
-from shutil import copytree
+import shutil
 import logging
 import os
 import argparse
-import glob
-import subprocess
+import json
+import bisect
+import hashlib
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # Python 2 without `pip install futures`
+    ThreadPoolExecutor = None
+import include.lib_scan as lib_scan
+
+FICLONE = 0x40049409  # ioctl of Linux for reflink (copy-on-write) copy
 
 
 def datetime_from_utc_to_local(utc_datetime):
@@ -108,44 +140,293 @@ def main1_convert_time_of_a_string(args):
         print(str_datetime)
 
 
-def main2_convert_timestamp_of_a_log_dir(args):
+def copy_file(src, dst):
+    ''' Copy a file with reflink if supported, or else with copy_file_range,
+    or else with a normal read/write copy. Then copy the permission bits and times. '''
+    copied = False
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                copied = True
+            except (IOError, OSError):
+                pass
+        if not copied and hasattr(os, "copy_file_range"):
+            try:
+                size = os.fstat(fsrc.fileno()).st_size
+                offset = 0
+                while offset < size:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - offset)
+                    if n == 0:
+                        break
+                    offset += n
+                copied = offset >= size
+            except OSError:
+                pass
+        if not copied:
+            # Start over, in case copy_file_range stopped half way
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            shutil.copyfileobj(fsrc, fdst)
+    shutil.copystat(src, dst)
+
+
+def copy_tree(src, dst):
+    ''' Same as `cp -r src dst`, with symlinks copied as symlinks. '''
+    if os.path.islink(src):
+        os.symlink(os.readlink(src), dst)
+    elif not os.path.isdir(src):
+        copy_file(src, dst)
+    else:
+        os.makedirs(dst)
+        for name in os.listdir(src):
+            copy_tree(os.path.join(src, name), os.path.join(dst, name))
+        shutil.copystat(src, dst)
+
+
+def get_newest_mtime(path):
+    ''' Return the newest mtime of path and everything inside it. Symlinks are not followed. '''
+    newest = os.lstat(path).st_mtime
+    if os.path.isdir(path) and not os.path.islink(path):
+        for root, dirs, files in os.walk(path):
+            for name in dirs + files:
+                newest = max(newest, os.lstat(os.path.join(root, name)).st_mtime)
+    return newest
+
+
+def get_timestamped_name(log_folder_path):
+    ''' Return "[local datetime]" + basename, or None if the basename doesn't start with a timestamp. '''
+    basename = os.path.basename(os.path.normpath(log_folder_path))
+    timestamp = basename.split('_')[0]
+    try:
+        return "[" + timestamp_to_datetime(timestamp) + "]" + basename
+    except Exception:
+        return None
+
+
+def link_or_copy(src, dst, use_copy):
+    ''' Create a copy or softlink of src at dst. Return False if dst already exists. '''
+    if os.path.lexists(dst):
+        return False
+    if not use_copy:
+        os.symlink(os.path.abspath(src), dst)
+        return True
+    # Copy into a temporary path first, so an interrupted copy isn't skipped next time.
+    tmp_dst = os.path.join(os.path.dirname(dst), ".tmp" + os.path.basename(dst))
+    if os.path.isdir(tmp_dst) and not os.path.islink(tmp_dst):
+        shutil.rmtree(tmp_dst)
+    elif os.path.lexists(tmp_dst):
+        os.remove(tmp_dst)
+    copy_tree(src, tmp_dst)
+    os.rename(tmp_dst, dst)
+    return True
+
+
+def convert_log_folders(log_folders_paths, output_dir, use_copy, num_workers=8, settle=0):
+    ''' Create the timestamped copies/softlinks of the log folders in output_dir.
+    If use_copy, the log folders with any change in the last `settle` seconds
+    are not copied yet, since they may be still being written.
+    Return:
+        cnt_new {int}: Number of new copies/softlinks.
+        cnt_unsettled {int}: Number of log folders not copied yet.
+    '''
+    jobs = []
+    for log_folder_path in log_folders_paths:
+        name = get_timestamped_name(log_folder_path)
+        if name is None:
+            print(
+                "WARNING: This file doesn't have a prefix timestamp: " + log_folder_path)
+            print("         Skip it.")
+            continue
+        jobs.append((log_folder_path, os.path.join(output_dir, name)))
+
+    def run(job):
+        src, dst = job
+        if use_copy and settle > 0 and not os.path.lexists(dst) and \
+                time.time() - get_newest_mtime(src) < settle:
+            return None
+        return link_or_copy(src, dst, use_copy)
+
+    if use_copy and num_workers > 1 and ThreadPoolExecutor is not None:
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            results = list(pool.map(run, jobs))
+    else:
+        results = [run(job) for job in jobs]
+    for (src, dst), is_new in zip(jobs, results):
+        if is_new:
+            print(os.path.basename(dst))
+        elif is_new is None:
+            print("Still being written, not copied yet: " + src)
+    cnt_new = sum(1 for res in results if res is True)
+    cnt_unsettled = sum(1 for res in results if res is None)
+    return cnt_new, cnt_unsettled
 
-    cwd = os.getcwd() + "/"
+
+def main2_convert_timestamp_of_a_log_dir(args):
 
     # -- parse input
-    log_dir = args.log_dir + "/"
-    output_dir = args.output_dir + "/"
+    log_dir = args.log_dir
+    output_dir = args.output_dir
     use_copy = args.method == "copy"
+    settle = args.settle
+    if settle is None:  # Wait for the log folders to settle only if they'll be checked again
+        settle = 30 if args.watch else 0
 
     if not os.path.isdir(output_dir):
         os.makedirs(output_dir)
 
-    # -- Read log-dir
-    # log_folders_paths = filter(os.path.isdir, glob.glob(log_dir + "*"))
-    log_folders_paths = glob.glob(log_dir + "*")
-    print(len(log_folders_paths))
+    # -- Read log-dir, and convert the new files/folders.
+    # With --watch, log-dir is scanned again whenever its mtime changes,
+    # or while some log folders are still being written.
+    last_mtime = None
+    cnt_unsettled = 0
+    while True:
+        mtime = os.stat(log_dir).st_mtime
+        if mtime != last_mtime or cnt_unsettled:
+            last_mtime = mtime
+            log_folders_paths = lib_scan.get_filenames(
+                log_dir, include_dirs=True, sort="name", with_stat=False)
+            cnt_new, cnt_unsettled = convert_log_folders(
+                log_folders_paths, output_dir, use_copy, args.workers, settle)
+            print("%d files/folders, %d new, %d still being written." % (
+                len(log_folders_paths), cnt_new, cnt_unsettled))
+        if not args.watch:
+            break
+        try:
+            time.sleep(args.watch)
+        except KeyboardInterrupt:
+            break
 
-    for log_folder_path in log_folders_paths:
 
-        # read timestamp and convert to readable datetime
-        basename = log_folder_path.split('/')[1]
-        timestamp = basename.split('_')[0]
-        try:
-            datetime = "[" + timestamp_to_datetime(timestamp) + "]"
-        except:
-            print(
-                "WARNING: This file doesn't have a prefix timestamp: " + log_folder_path)
-            print("         Skip it.")
-            continue
-        print(datetime)
+def str_to_timestamp_ms(str_input):
+    ''' Convert a local datetime or a timestamp (s or ms) to a timestamp in ms. '''
+    if len(str_input) > 4 and not str_input.isdigit() and (2000 <= int(str_input[:4]) <= 2100):
+        return int(datetime_to_timestamp(str_input))
+    ts = int(str_input)
+    return ts if ts >= 10 ** 11 else ts * 1000
+
+
+def get_folder_timestamp_ms(basename):
+    ''' Return the timestamp (ms) prefix of a log folder's name, or None. '''
+    prefix = basename.split('_')[0]
+    if not prefix.isdigit():
+        return None
+    ts = int(prefix)
+    return ts if ts >= 10 ** 11 else ts * 1000
+
 
-        # operate
-        if use_copy:  # copy
-            subprocess.check_output(
-                ['cp', '-r', cwd + log_folder_path, output_dir + datetime + basename])
-        else:  # create softlink
-            subprocess.check_output(
-                ['ln', '-s', cwd + log_folder_path, output_dir + datetime + basename])
+def get_default_index_path(log_dir):
+    ''' Return ~/.cache/convert_timestamp/${log_dir_name}_${hash_of_its_abspath}.json.
+    The index isn't saved into the log-dir, whose mtime tells when to update the index,
+    or next to it, where we may not have write permission.
+    '''
+    abspath = os.path.abspath(log_dir)
+    if not isinstance(abspath, bytes):
+        abspath = abspath.encode("utf-8")
+    return os.path.join(
+        os.path.expanduser("~/.cache/convert_timestamp"),
+        "%s_%s.json" % (os.path.basename(os.path.normpath(log_dir)),
+                        hashlib.sha1(abspath).hexdigest()[:12]))
+
+
+class TimestampIndex(object):
+    ''' A sorted index of the timestamps of the files/folders in a log directory.
+    It's saved as a json file (see `get_default_index_path`), and when the mtime
+    of the log-dir has changed, only the added and removed names are updated.
+    Queries use bisection, so they are O(log n).
+    '''
+
+    def __init__(self, log_dir, index_path=None):
+        self.log_dir = os.path.normpath(log_dir)
+        self.index_path = index_path or get_default_index_path(log_dir)
+        self.log_dir_mtime = None
+        self.timestamps = []  # sorted
+        self.names = []  # names[i] is the name with timestamps[i]
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    data = json.load(f)
+                self.log_dir_mtime = data["log_dir_mtime"]
+                self.timestamps = data["timestamps"]
+                self.names = data["names"]
+            except (IOError, OSError, ValueError, KeyError):
+                print("WARNING: Can't read the timestamp index %s. Rebuild it." % self.index_path)
+
+    def update(self):
+        ''' Add the new names, and remove the deleted names. Return True if updated. '''
+        mtime = os.stat(self.log_dir).st_mtime
+        if mtime == self.log_dir_mtime:
+            return False
+        names = set(e.name for e in lib_scan.scan_dir(
+            self.log_dir, include_dirs=True, sort=None, with_stat=False))
+        old_names = set(self.names)
+        removed = old_names - names
+        if removed:
+            kept = [(t, n) for t, n in zip(self.timestamps, self.names) if n not in removed]
+            self.timestamps = [t for t, _ in kept]
+            self.names = [n for _, n in kept]
+        for name in sorted(names - old_names):
+            ts = get_folder_timestamp_ms(name)
+            if ts is None:
+                continue
+            i = bisect.bisect_right(self.timestamps, ts)
+            self.timestamps.insert(i, ts)
+            self.names.insert(i, name)
+        self.log_dir_mtime = mtime
+        self.save()
+        return True
+
+    def save(self):
+        ''' Save the index. Return False if it can't be written,
+        in which case it's only kept in memory. '''
+        tmp_path = self.index_path + ".tmp"
+        try:
+            index_dir = os.path.dirname(self.index_path)
+            if index_dir and not os.path.isdir(index_dir):
+                os.makedirs(index_dir)
+            with open(tmp_path, 'w') as f:
+                json.dump({"log_dir_mtime": self.log_dir_mtime,
+                           "timestamps": self.timestamps,
+                           "names": self.names}, f)
+            getattr(os, "replace", os.rename)(tmp_path, self.index_path)
+        except (IOError, OSError) as e:
+            print("WARNING: Can't save the timestamp index, so it's only kept in memory: " + str(e))
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return False
+        return True
+
+    def query_range(self, start_ms, end_ms):
+        ''' Return [(timestamp_ms, name)] with start_ms <= timestamp_ms <= end_ms. '''
+        i = bisect.bisect_left(self.timestamps, start_ms)
+        j = bisect.bisect_right(self.timestamps, end_ms)
+        return list(zip(self.timestamps[i:j], self.names[i:j]))
+
+    def query_around(self, ts_ms, seconds):
+        ''' Return [(timestamp_ms, name)] within the seconds before and after ts_ms. '''
+        return self.query_range(ts_ms - int(seconds * 1000), ts_ms + int(seconds * 1000))
+
+
+def main3_query_log_dir(args):
+    '''
+    Print the log folders near a time, or in a time range.
+        Example usage: $ python convert_timestamp.py -i log -q '2019-08-09 17:20:32' --within 30
+        Example usage: $ python convert_timestamp.py -i log -q '2019-08-09 17:00:00' --until '2019-08-09 18:00:00'
+    '''
+    index = TimestampIndex(args.log_dir, args.index_path)
+    index.update()
+    ts_ms = str_to_timestamp_ms(args.query)
+    if args.until:
+        results = index.query_range(ts_ms, str_to_timestamp_ms(args.until))
+    else:
+        results = index.query_around(ts_ms, args.within)
+    print("%d of %d log folders:" % (len(results), len(index.names)))
+    for ts, name in results:
+        print("[%s] (%+.1fs) %s" % (timestamp_to_datetime(ts), (ts - ts_ms) / 1000.0, name))
 
 
 if __name__ == "__main__":
@@ -154,6 +435,7 @@ if __name__ == "__main__":
         description="Two functions:"
         "(1) Change log-dir's timestamp to human-readable datetime and save to output-dir. "
         "(2) Use -t to input a time. The script will do the timestamp-datetime conversion and print the result. "
+        "(3) Use -i and -q to find the log folders near a time, or in a time range. "
     )
     parser.add_argument("-i", "--log-dir", type=str, required=False, default="",
                         help="input log folder")
@@ -162,15 +444,35 @@ if __name__ == "__main__":
     parser.add_argument("-m",  "--method", type=str, required=False, default="link",
                         choices=["copy", "link"],
                         help="choose copy or link")
+    parser.add_argument("-w", "--workers", type=int, required=False, default=8,
+                        help="number of threads for copying log folders")
+    parser.add_argument("--watch", type=float, required=False, default=0,
+                        help="If > 0, keep checking log-dir for new log folders every this many seconds.")
+    parser.add_argument("--settle", type=float, required=False, default=None,
+                        help="With --method copy, only copy the log folders which haven't changed "
+                        "for this many seconds. Default 30 with --watch, or else 0.")
     parser.add_argument("-t", "--time_to_convert", type=str, required=False,
                         default="",
                         help="If this value is a timestamp, print the corresponding local datetime."
                         "If this value is a local datetime, print the corresponding timestamp.")
+    parser.add_argument("-q", "--query", type=str, required=False, default="",
+                        help="A local datetime or timestamp. Print the log folders near it.")
+    parser.add_argument("--within", type=float, required=False, default=60,
+                        help="Seconds before and after the query time. Default 60.")
+    parser.add_argument("--until", type=str, required=False, default="",
+                        help="If set, print the log folders from the query time to this time instead.")
+    parser.add_argument("--index-path", type=str, required=False, default="",
+                        help="Where to save the timestamp index of log-dir. "
+                        "Default: ~/.cache/convert_timestamp/${log_dir_name}_${hash}.json")
     args = parser.parse_args()
 
     if args.time_to_convert:
         print("Do the timestamp-datetime conversion.")
         main1_convert_time_of_a_string(args)
+    elif args.query:
+        if not args.log_dir:
+            raise ValueError("You must input log-dir")
+        main3_query_log_dir(args)
     else:
         if not args.log_dir or not args.output_dir:
             raise ValueError("You must input log-dir and output-dir")
@@ -2,9 +2,15 @@
 Function:
     Given a log folder path, the script reads in the config.yaml and images, and then 
     draws the 3d point cloud and 2d heightmap.
+    The images of all sensors of the tote are decoded and processed on a thread pool.
+    The merged cloud and the heightmaps are cached as .npy files in --cache-dir,
+    keyed by (log folder, tote id, resize ratio, voxel size) and the sizes and
+    mtimes of the input files. The next run of the same log folder memory-maps
+    them instead of reading the images again.
 
 Example of usage:
     python draw_3d_cloud_and_hmap.py --log-folder 1565727031726_getSuctionPrimitives_2 --tote-id 2
+    python draw_3d_cloud_and_hmap.py --log-folder 1565727031726_getSuctionPrimitives_2 --tote-id 2 --no-cache
 
 Dependencies:
     $ pip install --user open3d-python
@@ -20,7 +26,14 @@ import sys
 import glob
 import argparse
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 import include.lib_point_cloud as lib_cloud
+import include.lib_images as lib_images
+import include.lib_scan as lib_scan
+import include.lib_cloud_cache as lib_cloud_cache
+
+HEIGHTMAP_W, HEIGHTMAP_H = 300, 200
 
 
 def parse_args():
@@ -32,6 +45,21 @@ def parse_args():
                         help="path to the log folder")
     parser.add_argument("-t", "--tote-id", type=str, required=True,
                         help="tote id")
+    parser.add_argument("-w", "--num-workers", type=int, required=False,
+                        default=None,
+                        help="number of threads for reading images and "
+                        "creating clouds. Default: decided by ThreadPoolExecutor.")
+    parser.add_argument("--resize-ratio", type=float, required=False,
+                        default=0.5,
+                        help="resize ratio of the images before creating clouds")
+    parser.add_argument("--voxel-size", type=float, required=False,
+                        default=0.002,
+                        help="size (meters) of a pixel of the heightmap")
+    parser.add_argument("--cache-dir", type=str, required=False,
+                        default="~/.cache/draw_3d_cloud_and_hmap",
+                        help="folder of the cached clouds and heightmaps")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="neither read nor write the cache")
     args = parser.parse_args()
     return args
 
@@ -39,105 +67,250 @@ def parse_args():
 def main(args):
     ''' Read from log folder, and draw the 3d point cloud and 2d heightmap. '''
 
-    # Read two rgbd images from the log folder
-    frames, tote = read_2_rgbd_frames(
-        args.log_folder, tote_id=args.tote_id, resize_ratio=0.5)
-
-    # Create point cloud
-    cloud1 = frames[0].create_color_cloud()
-    cloud2 = frames[1].create_color_cloud()
-    cloud_axis_tote = lib_cloud.create_cloud_of_xyz_axis(
-        transform4x4=tote.get_pose(), axis_len=1.0)
-    cloud_axis_cam1 = lib_cloud.create_cloud_of_xyz_axis(
-        transform4x4=frames[0].cam_pose, axis_len=0.1)
-    cloud_axis_cam2 = lib_cloud.create_cloud_of_xyz_axis(
-        transform4x4=frames[1].cam_pose, axis_len=0.1)
-    cloud = lib_cloud.merge_clouds([cloud1, cloud2])
+    # Read the processed cloud and heightmaps from the cache, or process the log folder
+    t0 = time.time()
+    cache, key, arrays = None, None, None
+    if not args.no_cache:
+        cache = lib_cloud_cache.ArrayCache(args.cache_dir)
+        key = get_cache_key(args.log_folder, args.tote_id,
+                            args.resize_ratio, args.voxel_size)
+        arrays = cache.load(key)
+    if arrays is not None:
+        print("Read from cache {} in {:.3f} seconds".format(
+            os.path.join(cache.cache_dir, key), time.time() - t0))
+    else:
+        arrays = process_log_folder(
+            args.log_folder, args.tote_id, args.resize_ratio, args.voxel_size,
+            num_workers=args.num_workers)
+        if cache is not None:
+            cache.save(key, arrays, info={
+                "log_folder": os.path.abspath(args.log_folder),
+                "tote_id": str(args.tote_id),
+                "resize_ratio": args.resize_ratio,
+                "voxel_size": args.voxel_size})
 
     # Draw point cloud
+    cloud = lib_cloud.ArrayCloud(arrays["xyz"], arrays["rgb"]).to_open3d()
+    cloud_axis_tote = lib_cloud.create_cloud_of_xyz_axis(
+        transform4x4=arrays["tote_pose"], axis_len=1.0)
+    clouds_axis_cam = [
+        lib_cloud.create_cloud_of_xyz_axis(
+            transform4x4=cam_pose, axis_len=0.1)
+        for cam_pose in arrays["cam_poses"]]
     cloud_viz = lib_cloud.merge_clouds(
-        [cloud, cloud_axis_tote, cloud_axis_cam1, cloud_axis_cam2])
+        [cloud, cloud_axis_tote] + clouds_axis_cam)
     open3d.draw_geometries([cloud_viz])
 
+    # Draw heightmap
+    show([arrays["heightmap_color"], arrays["heightmap_depth"]], figsize=(12, 5))
+
+    # Save point cloud
+    open3d.write_point_cloud("tmp.pcd", cloud_viz)
+
+
+def get_cache_key(folder_name, tote_id, resize_ratio, voxel_size):
+    ''' The cache key of the processed log folder.
+    The input files are config.json and the images of the tote. '''
+    tote_id = str(tote_id)
+    input_entries = lib_scan.scan_dir(
+        folder_name, ["config.json", tote_id + "_*"], sort="name")
+    params = {
+        "log_folder": os.path.abspath(folder_name),
+        "tote_id": tote_id,
+        "resize_ratio": resize_ratio,
+        "voxel_size": voxel_size,
+        "heightmap_size": [HEIGHTMAP_W, HEIGHTMAP_H],
+    }
+    return lib_cloud_cache.make_key(params, input_entries)
+
+
+def process_log_folder(folder_name, tote_id, resize_ratio=0.5, voxel_size=0.002,
+                       num_workers=None):
+    ''' Read the rgbd images of all sensors of the tote, create the merged
+    point cloud, and project it onto the color and depth heightmaps.
+    Return:
+        arrays {dict}: The arrays to cache:
+            "xyz", "rgb": (N, 3) float32, the merged cloud.
+            "heightmap_color": (H, W, 3) float32.
+            "heightmap_depth": (H, W) float32.
+            "tote_pose": (4, 4). "cam_poses": (num_sensors, 4, 4).
+    '''
+
+    # Read rgbd images of all sensors of the tote from the log folder
+    timings = {}
+    frames, tote = read_rgbd_frames(
+        folder_name, tote_id=tote_id, resize_ratio=resize_ratio,
+        num_workers=num_workers, timings=timings)
+
+    # Create point cloud
+    clouds = create_clouds(frames, cloud_type="color",
+                           num_workers=num_workers, timings=timings)
+    t0 = time.time()
+    cloud = lib_cloud.merge_clouds(clouds)
+    timings["merge_cloud"] = time.time() - t0
+
     # Get heightmap
+    t0 = time.time()
     heightmap_color = project_cloud_to_tote(
         cloud, tote, cloud_type="color",
-        voxel_size=0.002, img_w=300, img_h=200)
+        voxel_size=voxel_size, img_w=HEIGHTMAP_W, img_h=HEIGHTMAP_H)
 
     heightmap_depth = project_cloud_to_tote(
         cloud, tote, cloud_type="depth",
-        voxel_size=0.002, img_w=300, img_h=200)
+        voxel_size=voxel_size, img_w=HEIGHTMAP_W, img_h=HEIGHTMAP_H)
+    timings["heightmap"] = time.time() - t0
+    print_timings(timings)
 
-    show([heightmap_color, heightmap_depth], figsize=(12, 5))
-
-    # Save point cloud
-    open3d.write_point_cloud("tmp.pcd", cloud_viz)
+    xyz, rgb = lib_cloud.get_cloud_xyzrgb(cloud)
+    return {
+        "xyz": xyz.astype(np.float32),
+        "rgb": rgb.astype(np.float32),
+        "heightmap_color": heightmap_color,
+        "heightmap_depth": heightmap_depth,
+        "tote_pose": tote.get_pose(),
+        "cam_poses": np.array([frame.cam_pose for frame in frames]),
+    }
 
 
 def read_2_rgbd_frames(folder_name, tote_id, resize_ratio=0.5):
-    ''' Read from the config.json of the standard log folder. '''
-
-    # Output
-    rgbd_frames = []
+    ''' Read from the config.json of the standard log folder. 
+    There must be 2 sensors matching the tote_id.
+    '''
+    return read_rgbd_frames(folder_name, tote_id, resize_ratio, num_sensors=2)
+
+
+def read_rgbd_frames(folder_name, tote_id, resize_ratio=0.5,
+                     num_sensors=None, num_workers=None, timings=None):
+    ''' Read from the config.json of the standard log folder, 
+    and load the rgbd images of all sensors matching the tote_id.
+    The images of all sensors are decoded on a thread pool,
+    and then each sensor's frame is preprocessed on the pool.
+    Arguments:
+        num_sensors {int}: If not None, the number of sensors must be this.
+        num_workers {int}: Number of threads. Default: decided by ThreadPoolExecutor.
+        timings {dict}: If not None, the time (seconds) of each stage is stored here.
+    Return:
+        rgbd_frames {list of RgbdFrame}
+        tote {Tote}
+    '''
 
     # Check input
     if folder_name[-1] != '/':
         folder_name += '/'
     tote_id = str(tote_id)
+    if timings is None:
+        timings = {}
 
-    # From config.json, read sensor info, and then load color/depth images
+    # From config.json, read sensor info and the tote
+    t0 = time.time()
     filename = folder_name + "config.json"
     with open(filename) as json_file:
         data = json.load(json_file)
-        sensors = data["sensor"]
-        cnt_sensor = 0
-        for sensor_id, sensor in sensors.items():
-            if sensor["tote_id"] != tote_id:
-                continue  # find sensor that matches with tote_id
-            cnt_sensor += 1
-            print("Reading cloud {} ...".format(cnt_sensor))
-            color_intr = sensor["color_intr"]
-            cam_pose = sensor["pose"]  # 2d list
-            intrinsics = open3d.camera.PinholeCameraIntrinsic(
-                width=color_intr["width"],
-                height=color_intr["height"],
-                fx=color_intr["fx"],
-                fy=color_intr["fy"],
-                cx=color_intr["ppx"],
-                cy=color_intr["ppy"],
-            )
-            cam_pose = np.array(cam_pose)
-
-            # Get image names
-            affor_name = folder_name + tote_id + \
-                "_" + sensor_id + "_affordance.jpg"
-            color_name = folder_name + tote_id + "_" + sensor_id + "_color.png"
-            depth_name = folder_name + tote_id + \
-                "_" + sensor_id + "_aligned_depth.png"
-            if not os.path.exists(affor_name) or not os.path.exists(color_name) or not os.path.exists(depth_name):
-                raise IOError("File doesn't exist: \n" + color_name + "\n")
-
-            # Convert to class RgbdFrame
-            rgbd_frame = RgbdFrame(
-                color_name, depth_name, affor_name,
-                intrinsics, cam_pose, resize_ratio)
-            rgbd_frames += [rgbd_frame]
-
-        if cnt_sensor != 2:
-            raise ValueError("Only {} sensor matches tote_id {}. There must be 2 sensors.".format(
-                cnt_sensor, tote_id))
-
-        # Read tote position and size
-        tote_info = data["tote"][tote_id]
-        tote = Tote(
-            translation=tote_info["translation"],
-            length=tote_info["length"],
-            width=tote_info["width"],
-            height=tote_info["height"],
+    sensors_info = []
+    for sensor_id, sensor in data["sensor"].items():
+        if sensor["tote_id"] != tote_id:
+            continue  # find sensor that matches with tote_id
+        color_intr = sensor["color_intr"]
+        cam_pose = sensor["pose"]  # 2d list
+        intrinsics = open3d.camera.PinholeCameraIntrinsic(
+            width=color_intr["width"],
+            height=color_intr["height"],
+            fx=color_intr["fx"],
+            fy=color_intr["fy"],
+            cx=color_intr["ppx"],
+            cy=color_intr["ppy"],
         )
+        cam_pose = np.array(cam_pose)
+
+        # Get image names
+        affor_name = folder_name + tote_id + \
+            "_" + sensor_id + "_affordance.jpg"
+        color_name = folder_name + tote_id + "_" + sensor_id + "_color.png"
+        depth_name = folder_name + tote_id + \
+            "_" + sensor_id + "_aligned_depth.png"
+        if not os.path.exists(affor_name) or not os.path.exists(color_name) or not os.path.exists(depth_name):
+            raise IOError("File doesn't exist: \n" + color_name + "\n")
+        sensors_info.append(
+            (color_name, depth_name, affor_name, intrinsics, cam_pose))
+
+    cnt_sensor = len(sensors_info)
+    if cnt_sensor == 0 or (num_sensors is not None and cnt_sensor != num_sensors):
+        raise ValueError("Only {} sensor matches tote_id {}. There must be {} sensors.".format(
+            cnt_sensor, tote_id, num_sensors if num_sensors else "> 0"))
+    print("Reading {} clouds ...".format(cnt_sensor))
+
+    # Read tote position and size
+    tote_info = data["tote"][tote_id]
+    tote = Tote(
+        translation=tote_info["translation"],
+        length=tote_info["length"],
+        width=tote_info["width"],
+        height=tote_info["height"],
+    )
+    timings["read_config"] = time.time() - t0
+
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+
+        # Decode all images of all sensors
+        t0 = time.time()
+        filenames = [name for info in sensors_info for name in info[0:3]]
+        images = list(pool.map(
+            lambda name: read_resized_image(name, resize_ratio), filenames))
+        timings["decode"] = time.time() - t0
+
+        # Convert to class RgbdFrame
+        t0 = time.time()
+
+        def create_frame(i):
+            color_name, depth_name, affor_name, intrinsics, cam_pose = sensors_info[i]
+            return RgbdFrame(
+                color_name, depth_name, affor_name,
+                intrinsics, cam_pose, resize_ratio,
+                images=images[3*i:3*i+3])
+        rgbd_frames = list(pool.map(create_frame, range(cnt_sensor)))
+        timings["preprocess"] = time.time() - t0
+
     return rgbd_frames, tote
 
 
+def read_resized_image(filename, resize_ratio):
+    ''' Read an image of RgbdFrame, and resize it by resize_ratio.
+    Jpegs (the affordance) are decoded directly at a reduced size. '''
+    return lib_images.imread_scaled(
+        filename, scale=resize_ratio, flags=cv2.IMREAD_UNCHANGED,
+        interpolation=cv2.INTER_NEAREST)
+
+
+def create_clouds(rgbd_frames, cloud_type="color",
+                  num_workers=None, timings=None):
+    ''' Create the clouds of all rgbd frames on a thread pool.
+    Arguments:
+        cloud_type {str}: "color" or "affordance".
+        timings {dict}: If not None, the time of this stage is stored here.
+    '''
+    supported_cloud_types = ["color", "affordance"]
+    if cloud_type not in supported_cloud_types:
+        raise ValueError("Cloud type should be: " + str(supported_cloud_types))
+    t0 = time.time()
+
+    def create_cloud(frame):
+        if cloud_type == "color":
+            return frame.create_color_cloud()
+        return frame.create_affordance_cloud()
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        clouds = list(pool.map(create_cloud, rgbd_frames))
+    if timings is not None:
+        timings["create_cloud"] = time.time() - t0
+    return clouds
+
+
+def print_timings(timings):
+    ''' Print the time of each stage, in the order they were recorded. '''
+    for stage, t in timings.items():
+        print("'{}' takes {:.3f} seconds".format(stage, t))
+    print("Total: {:.3f} seconds".format(sum(timings.values())))
+
+
 class Tote(object):
     def __init__(self, translation, length, width, height):
         self.translation = np.array(translation)
@@ -160,12 +333,19 @@ class RgbdFrame(object):
     ''' A wrapper to store rgb, depth, affordance, and camera info '''
 
     def __init__(self, color_name, depth_name, affor_name,
-                 intrinsics, cam_pose, resize_ratio):
+                 intrinsics, cam_pose, resize_ratio, images=None):
+        ''' 
+        Arguments:
+            images {list}: Optional. The already decoded [color, depth, affor] images,
+                either in full size or already resized by resize_ratio.
+                If None, the images are read from the filenames.
+        '''
 
         #  -- Read images
-        self.color = cv2.imread(color_name, cv2.IMREAD_UNCHANGED)
-        self.depth = cv2.imread(depth_name, cv2.IMREAD_UNCHANGED)
-        self.affor = cv2.imread(affor_name, cv2.IMREAD_UNCHANGED)
+        if images is None:
+            images = [read_resized_image(name, resize_ratio)
+                      for name in [color_name, depth_name, affor_name]]
+        self.color, self.depth, self.affor = images
         self.color = cv2.cvtColor(self.color, cv2.COLOR_BGR2RGB)
 
         # -- Store params
@@ -207,19 +387,32 @@ class RgbdFrame(object):
         return cloud
 
     def _resize_image(self, ratio=0.5):
-        self.color = cv2.resize(
-            self.color, None, fx=ratio, fy=ratio, interpolation=cv2.INTER_NEAREST)
-        self.depth = cv2.resize(
-            self.depth, None, fx=ratio, fy=ratio, interpolation=cv2.INTER_NEAREST)
-        self.affor = cv2.resize(
-            self.affor, None, fx=ratio, fy=ratio, interpolation=cv2.INTER_NEAREST)
+        ''' Resize the images by ratio of the camera resolution.
+        Images which were already decoded at the resized size are kept. '''
+        dsize = (int(round(self.intrinsics.width * ratio)),
+                 int(round(self.intrinsics.height * ratio)))
+
+        def resize(img):
+            if (img.shape[1], img.shape[0]) == dsize:
+                return img
+            return cv2.resize(
+                img, None, fx=ratio, fy=ratio, interpolation=cv2.INTER_NEAREST)
+        self.color = resize(self.color)
+        self.depth = resize(self.depth)
+        self.affor = resize(self.affor)
         self.intrinsics.intrinsic_matrix = ratio * self.intrinsics.intrinsic_matrix
 
 
 def project_cloud_to_tote(
         cloud, tote, cloud_type,
-        voxel_size, img_w, img_h):
-    ''' Project 3d point cloud onto 2d image to get the heightmap '''
+        voxel_size, img_w, img_h, reduction=None):
+    ''' Project 3d point cloud onto 2d image to get the heightmap.
+    Arguments:
+        reduction {str}: How to combine the points falling into the same pixel.
+            One of "max", "min", "mean", "last", "count".
+            Default: "max" for 1-channel ("depth", "affordance"), 
+                     and "last" for "color".
+    '''
 
     # -- Check input
     supported_cloud_types = ["color", "depth", "affordance"]
@@ -233,15 +426,12 @@ def project_cloud_to_tote(
     elif cloud_type == "depth":
         values = arr_xyz[:, -1:]  # z value
     channels = values.shape[1]
+    if reduction is None:
+        reduction = "max" if channels == 1 else "last"
 
     # -- Init variables
-    N = arr_xyz.shape[0]
     w_mid = (img_w-1)/2.0
     h_mid = (img_h-1)/2.0
-    if channels == 1:
-        heightmap = np.zeros((img_h, img_w), dtype=np.float32)
-    else:
-        heightmap = np.zeros((img_h, img_w, channels), dtype=np.float32)
 
     # -- transform all points into the tote coordinate
     T_tote_to_world = np.linalg.inv(tote.get_pose())
@@ -252,22 +442,60 @@ def project_cloud_to_tote(
         return arr_xyz1_transformed[:, 0:3]
     arr_xyz = transform(arr_xyz, T_tote_to_world)
 
-    # -- Start to project points
-    for i in range(N):
-
-        x, y, z = arr_xyz[i]
-        value = values[i]
+    # -- Compute the pixel of all points at once
+    # (np.trunc rounds toward zero, the same as int())
+    wi = np.trunc(w_mid - arr_xyz[:, 1]/voxel_size).astype(np.int64)
+    hi = np.trunc(h_mid - arr_xyz[:, 0]/voxel_size).astype(np.int64)
+    valid = (wi >= 0) & (wi < img_w) & (hi >= 0) & (hi < img_h)
+    indices = hi[valid] * img_w + wi[valid]
+    values = values[valid].astype(np.float32)
+
+    # -- Reduce the values of each pixel
+    heightmap = scatter_reduce(indices, values, img_h * img_w, reduction)
+    if channels == 1 or reduction == "count":
+        heightmap = heightmap.reshape((img_h, img_w))
+    else:
+        heightmap = heightmap.reshape((img_h, img_w, channels))
+    return heightmap
 
-        wi = int(w_mid - y/voxel_size)
-        hi = int(h_mid - x/voxel_size)
-        if (wi < 0 or wi >= img_w or hi < 0 or hi >= img_h):
-            continue
-        if channels == 1:  # Retrain the largest
-            heightmap[hi, wi] = max(heightmap[hi, wi], value)
-        else:  # over-write old data
-            heightmap[hi, wi] = value
 
-    return heightmap
+def scatter_reduce(indices, values, size, reduction):
+    ''' Reduce the (N, C) `values` into an output of (size, C) by `indices`.
+    Cells without any value are 0. 
+    Same as the previous per-point loop, "max" starts from 0,
+    so negative values are clipped to 0.
+    Arguments:
+        indices {np.ndarray}: (N, ), int, output cell of each value.
+        values {np.ndarray}: (N, C).
+        reduction {str}: "max", "min", "mean", "last" or "count".
+    Return:
+        out {np.ndarray}: (size, C), float32. For "count", (size, ).
+    '''
+    supported_reductions = ["max", "min", "mean", "last", "count"]
+    if reduction not in supported_reductions:
+        raise ValueError("Reduction should be: " + str(supported_reductions))
+
+    counts = np.bincount(indices, minlength=size)
+    if reduction == "count":
+        return counts.astype(np.float32)
+
+    out = np.zeros((size, values.shape[1]), dtype=np.float32)
+    if reduction == "max":
+        np.maximum.at(out, indices, values)
+    elif reduction == "min":
+        out[:] = np.inf
+        np.minimum.at(out, indices, values)
+        out[counts == 0] = 0
+    elif reduction == "mean":
+        np.add.at(out, indices, values)
+        occupied = counts > 0
+        out[occupied] /= counts[occupied, np.newaxis]
+    elif reduction == "last":
+        # The last occurrence of each index is the first one in reversed order
+        _, first_in_reversed = np.unique(indices[::-1], return_index=True)
+        last = len(indices) - 1 - first_in_reversed
+        out[indices[last]] = values[last]
+    return out
 
 
 def show(imgs, figsize=(6, 10), layout=None, titles=[],
@@ -9,6 +9,10 @@ Example of usage:
         --framerate 30 \
         --sample_interval 1
 
+    Images are decoded on a pool of threads and prefetched into a bounded queue,
+    so decoding runs in parallel with the video encoding.
+    Add `--no_display` to run without any window, e.g., on a server.
+
 '''
 
 import numpy as np
@@ -21,8 +25,11 @@ import simplejson
 import sys
 import os
 import csv
-import glob
 import argparse
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import include.lib_scan as lib_scan
 ROOT = os.path.dirname(os.path.abspath(__file__))+"/"
 
 
@@ -36,27 +43,59 @@ def parse_args():
     parser.add_argument("-s", "--sample_interval", type=int, required=False,
                         default=1,
                         help="Sample every nth image for creating video. Default 1.")
+    parser.add_argument("-w", "--num_workers", type=int, required=False,
+                        default=4,
+                        help="Number of threads for decoding images. Default 4.")
+    parser.add_argument("-p", "--prefetch_size", type=int, required=False,
+                        default=32,
+                        help="Max number of decoded images waiting to be written. Default 32.")
+    parser.add_argument("--no_display", action="store_true",
+                        help="Don't display the images.")
 
     args = parser.parse_args()
     return args
 
 
 class ReadFromFolder(object):
-    def __init__(self, folder_path):
-        fnames = []
-        for ext in [".jpg", ".png", ".jpeg", ".bmp"]:
-            fnames.extend(glob.glob(folder_path + "/*" + ext))
-        self.fnames = sorted(fnames)
+    def __init__(self, folder_path, sample_interval=1,
+                 num_workers=4, prefetch_size=32):
+        ''' Read images from a folder in the sorted order of filenames.
+        A background thread submits the images to a pool of decoding threads,
+        and keeps at most `prefetch_size` images in a queue.
+        Arguments:
+            sample_interval {int}: only read every kth image.
+        '''
+        fnames = lib_scan.get_filenames(
+            folder_path, ["*.jpg", "*.png", "*.jpeg", "*.bmp"], sort="name")
+        self.fnames = fnames[::sample_interval]
         if len(self.fnames) == 0:
             raise IOError("The folder has no images: " + folder_path)
         self.cnt_imgs = 0
         self.cur_filename = ""
-        
+
+        # -- Start prefetching
+        self._is_stopped = False
+        self._pool = ThreadPoolExecutor(max_workers=num_workers)
+        self._queue = queue.Queue(maxsize=prefetch_size)
+        self._thread = threading.Thread(target=self._prefetch)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _prefetch(self):
+        ''' Submit images to the decoding pool in order. 
+        The futures are put into the queue in the same order,
+        so the images come out in order. '''
+        for fname in self.fnames:
+            if self._is_stopped:
+                break
+            future = self._pool.submit(cv2.imread, fname, cv2.IMREAD_UNCHANGED)
+            self._queue.put((fname, future))  # blocks when the queue is full
+        self._queue.put(None)
 
     def read_image(self):
         if self.cnt_imgs < len(self.fnames):
-            self.cur_filename = self.fnames[self.cnt_imgs]
-            img = cv2.imread(self.cur_filename, cv2.IMREAD_UNCHANGED)
+            self.cur_filename, future = self._queue.get()
+            img = future.result()
             self.cnt_imgs += 1
             return img
         else:
@@ -69,7 +108,13 @@ class ReadFromFolder(object):
         return self.cur_filename
 
     def stop(self):
-        None
+        self._is_stopped = True
+        while self._thread.is_alive():  # unblock the prefetching thread
+            try:
+                self._queue.get(timeout=0.01)
+            except queue.Empty:
+                pass
+        self._pool.shutdown(wait=True)
 
 
 class VideoWriter(object):
@@ -122,19 +167,22 @@ class ImageDisplayer(object):
 
 def main(args):
 
-    images_loader = ReadFromFolder(args.input_folder_path)
+    images_loader = ReadFromFolder(
+        args.input_folder_path, args.sample_interval,
+        args.num_workers, args.prefetch_size)
     video_writer = VideoWriter(args.output_video_path, args.framerate)
-    img_displayer = ImageDisplayer()
+    img_displayer = None if args.no_display else ImageDisplayer()
 
     N = len(images_loader)
-    i = 0
-    while i < N:
-        print("Processing {}/{}th image".format(i, N))
-        img = images_loader.read_image()
-        if i % args.sample_interval == 0:
+    try:
+        for i in range(N):
+            print("Processing {}/{}th image".format(i, N))
+            img = images_loader.read_image()
             video_writer.write(img)
-            img_displayer.display(img)
-        i += 1
+            if img_displayer:
+                img_displayer.display(img)
+    finally:
+        images_loader.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+''' A disk cache of processed clouds and heightmaps, stored as .npy files and reopened by memory mapping '''
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+
+# Bump this when the content of the cached arrays changes.
+CACHE_VERSION = 1
+
+
+def make_key(params, input_entries):
+    ''' Hash the parameters and the inputs into a cache key.
+    Arguments:
+        params {dict}: Parameters of the processing, e.g., {"tote_id": "2"}.
+            Must be serializable by json.
+        input_entries {list of lib_scan.FileEntry}: The input files.
+            Their paths, sizes and mtimes are hashed, so modifying any input
+            file gives a new key.
+    Return:
+        key {str}
+    '''
+    content = {
+        "version": CACHE_VERSION,
+        "params": params,
+        "inputs": sorted([os.path.abspath(e.path), e.size, e.mtime]
+                         for e in input_entries),
+    }
+    return hashlib.sha1(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ArrayCache(object):
+    ''' Each entry is a folder of .npy files, one per array, plus an info.json.
+    Loading an entry memory-maps the .npy files (read only), so it takes
+    no time regardless of the array sizes, and nothing is parsed.
+
+    Usage:
+        cache = ArrayCache("~/.cache/clouds")
+        arrays = cache.load(key)
+        if arrays is None:
+            arrays = {"xyz": ..., "heightmap": ...}
+            cache.save(key, arrays, info={"log_folder": ...})
+    '''
+
+    def __init__(self, cache_dir):
+        self.cache_dir = os.path.expanduser(cache_dir)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key):
+        ''' Return {name: np.memmap} of the entry, or None if not cached. '''
+        entry_dir = self._entry_dir(key)
+        info_path = os.path.join(entry_dir, "info.json")
+        if not os.path.exists(info_path):
+            return None
+        with open(info_path, 'r') as f:
+            names = json.load(f)["arrays"]
+        return {name: np.load(os.path.join(entry_dir, name + ".npy"), mmap_mode='r')
+                for name in names}
+
+    def save(self, key, arrays, info=None):
+        ''' Write the arrays into a temporary folder and then rename it,
+        so an entry is either complete or doesn't exist.
+        Arguments:
+            arrays {dict}: name -> np.ndarray. Object arrays are not supported.
+            info {dict}: Optional. Saved into info.json for reference.
+        '''
+        entry_dir = self._entry_dir(key)
+        if os.path.exists(entry_dir):
+            return
+        tmp_dir = "{}.tmp{}".format(entry_dir, os.getpid())
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        try:
+            for name, values in arrays.items():
+                np.save(os.path.join(tmp_dir, name + ".npy"),
+                        np.ascontiguousarray(values), allow_pickle=False)
+            info = dict(info or {})
+            info["arrays"] = sorted(arrays.keys())
+            with open(os.path.join(tmp_dir, "info.json"), 'w') as f:
+                json.dump(info, f, indent=2, sort_keys=True)
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            if not os.path.exists(entry_dir):
+                raise
+            # Another process has saved the same entry
+        finally:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir)
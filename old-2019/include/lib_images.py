@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+''' Image reading with reduced-resolution jpeg decoding '''
+
+import struct
+import cv2
+
+# libjpeg can decode a jpeg directly at 1/2, 1/4 or 1/8 of its size.
+REDUCED_FLAGS = {
+    # factor: (color flag, grayscale flag)
+    2: (cv2.IMREAD_REDUCED_COLOR_2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+    4: (cv2.IMREAD_REDUCED_COLOR_4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    8: (cv2.IMREAD_REDUCED_COLOR_8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+}
+
+# Start-of-frame markers of baseline/progressive/lossless jpegs, etc.
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - set([0xC4, 0xC8, 0xCC])
+
+
+def read_jpeg_header(filename):
+    ''' Read the image size from the jpeg's start-of-frame marker,
+    without decoding the image.
+    Return:
+        (rows, cols, channels), or None if the file is not a jpeg,
+        or is truncated or corrupt before the start-of-frame marker.
+    '''
+    with open(filename, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            return None
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0:1] != b'\xff':
+                return None
+            code = ord(marker[1:2])
+            if code == 0xFF:  # padding
+                f.seek(-1, 1)
+                continue
+            if code in (0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7):
+                continue  # markers without a length
+            data = f.read(2)
+            if len(data) < 2:
+                return None
+            length = struct.unpack('>H', data)[0]
+            if length < 2:
+                return None  # The length includes its own 2 bytes
+            if code in JPEG_SOF_MARKERS:
+                data = f.read(6)
+                if len(data) < 6:
+                    return None
+                _, rows, cols, channels = struct.unpack('>BHHB', data)
+                if rows == 0 or cols == 0:
+                    return None
+                return rows, cols, channels
+            f.seek(length - 2, 1)
+
+
+def _get_reduced_flag(header, dsize, flags):
+    ''' Return the largest reduced-decoding flag whose output is still
+    not smaller than dsize, or None if the image should be decoded in full. '''
+    rows, cols, channels = header
+    if flags == cv2.IMREAD_GRAYSCALE:
+        is_color = False
+    elif flags == cv2.IMREAD_COLOR:
+        is_color = True
+    elif flags == cv2.IMREAD_UNCHANGED and channels in (1, 3):
+        is_color = channels == 3
+    else:
+        return None  # e.g.: cmyk jpeg, or special flags
+    for factor in (8, 4, 2):
+        if -(-rows // factor) >= dsize[1] and -(-cols // factor) >= dsize[0]:
+            flag = REDUCED_FLAGS[factor][0 if is_color else 1]
+            if flags == cv2.IMREAD_UNCHANGED:
+                # IMREAD_UNCHANGED doesn't rotate the image by exif
+                flag |= cv2.IMREAD_IGNORE_ORIENTATION
+            return flag
+    return None
+
+
+def imread_scaled(filename, scale=None, dsize=None,
+                  flags=cv2.IMREAD_UNCHANGED, interpolation=cv2.INTER_LINEAR):
+    ''' Read an image and resize it.
+    For a jpeg, the decoder directly outputs 1/2, 1/4 or 1/8 of the size
+    when the target size allows it, which needs up to 8x less cpu and memory,
+    and then the result is resized to the exact target size.
+    Other images are decoded in full and then resized.
+    Arguments:
+        scale {float}: Resize rate. Same as cv2.resize(img, None, fx=scale, fy=scale).
+        dsize {tuple or function}: Target (cols, rows),
+            or a function (rows, cols) -> (cols, rows) of the original size.
+            Either scale or dsize should be set.
+        flags {int}: cv2.IMREAD_UNCHANGED, cv2.IMREAD_COLOR or cv2.IMREAD_GRAYSCALE.
+        interpolation {int}: Interpolation of the final exact resize.
+    Return:
+        img {np.ndarray}, or None if the image can't be read.
+    '''
+    header = read_jpeg_header(filename)
+    if header is not None:
+        rows, cols = header[0:2]
+        if scale is not None:
+            target = (int(round(cols * scale)), int(round(rows * scale)))
+        elif callable(dsize):
+            target = dsize(rows, cols)
+        else:
+            target = dsize
+        reduced_flag = _get_reduced_flag(header, target, flags)
+        if reduced_flag is not None:
+            img = cv2.imread(filename, reduced_flag)
+            if img is None:
+                return None
+            if (img.shape[0] > img.shape[1]) != (rows > cols) and rows != cols:
+                # The image was rotated by its exif orientation
+                target = (target[1], target[0])
+            if (img.shape[1], img.shape[0]) != tuple(target):
+                img = cv2.resize(img, tuple(target), interpolation=interpolation)
+            return img
+
+    # Not a jpeg, or can't be reduced. Decode in full.
+    img = cv2.imread(filename, flags)
+    if img is None:
+        return None
+    if scale is not None:
+        if scale != 1.0:
+            img = cv2.resize(img, None, fx=scale, fy=scale,
+                             interpolation=interpolation)
+        return img
+    if callable(dsize):
+        dsize = dsize(img.shape[0], img.shape[1])
+    if (img.shape[1], img.shape[0]) != tuple(dsize):
+        img = cv2.resize(img, tuple(dsize), interpolation=interpolation)
+    return img
+
+
+def unittest_read_jpeg_header():
+    ''' Test read_jpeg_header and imread_scaled on a jpeg,
+    and on the jpeg truncated at every byte up to its start-of-frame marker,
+    which should give None instead of an exception. '''
+    import os
+    import tempfile
+    import numpy as np
+    img = np.random.randint(0, 255, (120, 160, 3), dtype=np.uint8)
+    data = cv2.imencode(".jpg", img)[1].tobytes()
+    filename = os.path.join(tempfile.mkdtemp(), "image.jpg")
+
+    with open(filename, 'wb') as f:
+        f.write(data)
+    assert read_jpeg_header(filename) == (120, 160, 3)
+    assert imread_scaled(filename, scale=0.25).shape == (30, 40, 3)
+
+    sof = min(data.find(b'\xff' + bytearray([c])) for c in JPEG_SOF_MARKERS
+              if data.find(b'\xff' + bytearray([c])) >= 0)
+    for size in range(sof + 10):
+        with open(filename, 'wb') as f:
+            f.write(data[:size])
+        assert read_jpeg_header(filename) is None
+        assert imread_scaled(filename, scale=0.25) is None
+    os.remove(filename)
+    print("unittest_read_jpeg_header: passed")
+
+
+if __name__ == "__main__":
+    unittest_read_jpeg_header()
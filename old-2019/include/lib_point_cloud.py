@@ -35,36 +35,13 @@ def form_cloud(np_points, np_colors):
 
 
 def merge_2clouds(cloud1, cloud2, radius_downsample=None, T=None):
-    if T is not None:
-        cloud1_transed = copy.deepcopy(cloud1)
-        cloud1_transed.transform(T)
-    else:
-        cloud1_transed = copy.deepcopy(cloud1)
-    cloud1_points, cloud1_colors = get_cloud_xyzrgb(cloud1_transed)
-    cloud2_points, cloud2_colors = get_cloud_xyzrgb(cloud2)
-
-    out_points = np.vstack((cloud1_points, cloud2_points))
-    out_colors = np.vstack((cloud1_colors, cloud2_colors))
-
-    result = form_cloud(out_points, out_colors)
-    if radius_downsample is not None:
-        result = open3d.voxel_down_sample(result, radius_downsample)
-    return result
+    ''' Merge cloud1 (transformed by T) and cloud2.
+    cloud1 is not copied, and the transform is applied while merging. '''
+    return _merge_open3d_clouds([cloud1, cloud2], [T, None], radius_downsample)
 
 
 def merge_clouds(clouds, radius_downsample=None):
-    list_xyz = []
-    list_rgb = []
-    for cloud in clouds:
-        xyz, rgb = get_cloud_xyzrgb(cloud)
-        list_xyz.append(xyz)
-        list_rgb.append(rgb)
-    res_xyz = np.vstack(list_xyz)
-    res_rgb = np.vstack(list_rgb)
-    result = form_cloud(res_xyz, res_rgb)
-    if radius_downsample is not None:
-        result = open3d.voxel_down_sample(result, radius_downsample)
-    return result
+    return _merge_open3d_clouds(clouds, [None] * len(clouds), radius_downsample)
 
 
 def resize_cloud_xyz(cloud, scale=1.0):
@@ -80,6 +57,347 @@ def remove_cloud_mean(cloud):
     new_cloud = form_cloud(cloud_points, cloud_colors)
     return new_cloud
 
+# -------------- Array-backed cloud --------------
+
+
+class ArrayCloud(object):
+    ''' A point cloud stored in contiguous float32 numpy arrays.
+    Compared with open3d.PointCloud (float64 Vector3dVector), it uses half
+    the memory, and its operations work in place or on views:
+        transform, scale, remove_mean: modify xyz in place.
+        cloud[a:b]: a view of the points, without copy.
+        cloud[mask], cloud[indices]: a new cloud (numpy fancy indexing copies).
+    Convert to open3d only for display or I/O by `to_open3d()`.
+
+    Attributes:
+        xyz {np.ndarray}: (N, 3) float32.
+        rgb {np.ndarray or None}: (N, 3) float32, in [0, 1].
+        attrs {dict}: name -> per-point array of shape (N, ...), e.g., {"affordance": (N, )}.
+    '''
+
+    def __init__(self, xyz, rgb=None, attrs=None, copy=False):
+        self.xyz = self._as_array(xyz, copy, (-1, 3))
+        self.rgb = None if rgb is None else self._as_array(rgb, copy, (-1, 3))
+        self.attrs = {}
+        for name, values in (attrs or {}).items():
+            self.attrs[name] = np.array(values, copy=True) if copy \
+                else np.ascontiguousarray(values)
+        for name, values in self._arrays().items():
+            if values.shape[0] != self.xyz.shape[0]:
+                raise ValueError("Wrong number of points in " + name)
+
+    @staticmethod
+    def _as_array(values, copy, shape):
+        if copy:
+            values = np.array(values, dtype=np.float32)
+        else:  # No copy if values is already a contiguous float32 array
+            values = np.ascontiguousarray(values, dtype=np.float32)
+        return values.reshape(shape)
+
+    def _arrays(self):
+        arrays = {"xyz": self.xyz}
+        if self.rgb is not None:
+            arrays["rgb"] = self.rgb
+        arrays.update(self.attrs)
+        return arrays
+
+    @classmethod
+    def from_open3d(cls, cloud, attrs=None):
+        xyz, rgb = get_cloud_xyzrgb(cloud)
+        return cls(xyz, rgb if rgb.size else None, attrs)
+
+    def to_open3d(self):
+        xyz = self.xyz.astype(np.float64)
+        if self.rgb is None:
+            return form_cloud(xyz, np.zeros_like(xyz))
+        return form_cloud(xyz, self.rgb.astype(np.float64))
+
+    def __len__(self):
+        return self.xyz.shape[0]
+
+    def __getitem__(self, index):
+        return ArrayCloud(
+            self.xyz[index],
+            None if self.rgb is None else self.rgb[index],
+            {name: values[index] for name, values in self.attrs.items()})
+
+    def copy(self):
+        return ArrayCloud(self.xyz, self.rgb, self.attrs, copy=True)
+
+    def filter(self, criteria):
+        ''' Return the points selected by a CloudFilter or a bool mask. '''
+        if isinstance(criteria, CloudFilter):
+            criteria = criteria.mask(self.xyz)
+        return self[criteria]
+
+    def transform(self, T):
+        ''' Apply the 4x4 rigid transform T to xyz in place. Return self. '''
+        T = np.asarray(T, dtype=np.float32)
+        self.xyz[...] = self.xyz.dot(T[0:3, 0:3].T)
+        self.xyz += T[0:3, 3]
+        return self
+
+    def scale(self, scale):
+        self.xyz *= scale
+        return self
+
+    def remove_mean(self):
+        self.xyz -= self.xyz.mean(axis=0)
+        return self
+
+# -------------- Voxel grid --------------
+
+
+# Voxel indices are packed into one int64 key, with 21 bits per axis.
+VOXEL_KEY_BITS = 21
+VOXEL_KEY_OFFSET = 1 << (VOXEL_KEY_BITS - 1)
+
+
+def voxel_keys(xyz, voxel_size):
+    ''' Return the int64 key of the voxel of each point.
+    Voxel indices must be within +-2^20 on each axis, e.g., +-1km for 1mm voxels. '''
+    return voxel_index_to_keys(np.floor(xyz / voxel_size).astype(np.int64))
+
+
+def voxel_index_to_keys(idx):
+    ''' Pack the (N, 3) integer voxel indices into (N, ) int64 keys. '''
+    idx = idx + VOXEL_KEY_OFFSET
+    return (idx[:, 0] << (2 * VOXEL_KEY_BITS)) | (idx[:, 1] << VOXEL_KEY_BITS) | idx[:, 2]
+
+
+def voxel_centers(keys, voxel_size):
+    ''' Return the (N, 3) centers of the voxels of the keys. '''
+    mask = (1 << VOXEL_KEY_BITS) - 1
+    idx = np.stack([(keys >> (2 * VOXEL_KEY_BITS)) & mask,
+                    (keys >> VOXEL_KEY_BITS) & mask,
+                    keys & mask], axis=1) - VOXEL_KEY_OFFSET
+    return (idx + 0.5) * voxel_size
+
+
+def _sum_by_key(keys, values, counts):
+    ''' Sum the rows of values (N, M) and counts (N, ) with the same key.
+    Return (unique_keys, sums, counts), sorted by key. '''
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    sums = np.empty((unique_keys.size, values.shape[1]), dtype=np.float64)
+    for j in range(values.shape[1]):
+        sums[:, j] = np.bincount(inverse, weights=values[:, j], minlength=unique_keys.size)
+    counts = np.bincount(inverse, weights=counts, minlength=unique_keys.size)
+    return unique_keys, sums, counts
+
+
+def _first_by_key(keys, values, counts):
+    ''' Keep the first row of each key. Return (unique_keys, rows, counts), sorted by key. '''
+    unique_keys, index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    counts = np.bincount(inverse, weights=counts, minlength=unique_keys.size)
+    return unique_keys, values[index], counts
+
+
+def _max_z_by_key(keys, values, counts):
+    ''' Keep the row with the largest z (column 2) of each key.
+    Return (unique_keys, rows, counts), sorted by key. '''
+    order = np.lexsort((-values[:, 2], keys))  # by key, and then by z in descending order
+    sorted_keys = keys[order]
+    is_first = np.ones(sorted_keys.size, dtype=bool)
+    is_first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    starts = np.flatnonzero(is_first)
+    rows = order[starts]
+    return keys[rows], values[rows], np.add.reduceat(counts[order], starts)
+
+
+class VoxelGrid(object):
+    ''' Voxel-grid downsampling of ArrayClouds, with one output point per voxel.
+    The points are grouped by their integer voxel keys with sort/unique reductions.
+    Aggregations:
+        "centroid": the average xyz, rgb and attributes of the points in the voxel.
+        "first": the first point added into the voxel.
+        "max_z": the point with the largest z in the voxel, e.g., for heightmaps.
+        "count": the center of the voxel, with the number of points in attrs["count"].
+    Clouds can be added chunk by chunk. Each chunk is reduced when it's added,
+    so the memory depends on the number of voxels, not the number of points.
+
+    Usage:
+        grid = VoxelGrid(0.005, "max_z")
+        for chunk in chunks:
+            grid.add(chunk)
+        cloud = grid.result()
+    '''
+
+    REDUCTIONS = {
+        "centroid": _sum_by_key,
+        "first": _first_by_key,
+        "max_z": _max_z_by_key,
+        "count": _sum_by_key,
+    }
+
+    def __init__(self, voxel_size, aggregation="centroid", has_rgb=None, attr_names=None):
+        '''
+        Arguments:
+            has_rgb {bool}: If None, same as the first added cloud.
+                If True, a cloud without rgb is added as black.
+            attr_names {list}: The attributes to keep. If None, those of the first added cloud.
+        '''
+        if aggregation not in self.REDUCTIONS:
+            raise ValueError("Invalid aggregation: " + str(aggregation))
+        self.voxel_size = voxel_size
+        self.aggregation = aggregation
+        self.has_rgb = has_rgb
+        self.attr_names = attr_names
+        self._attr_specs = None  # [(name, shape[1:], dtype)]
+        self._keys = None
+        self._values = None  # Sums for "centroid", or the kept points.
+        self._counts = None
+
+    def _set_layout(self, cloud):
+        if self.has_rgb is None:
+            self.has_rgb = cloud.rgb is not None
+        names = list(cloud.attrs) if self.attr_names is None else self.attr_names
+        self._attr_specs = [(name, cloud.attrs[name].shape[1:], cloud.attrs[name].dtype)
+                            for name in names]
+
+    def _pack(self, cloud, xyz):
+        ''' Put the xyz, rgb and attributes of the cloud into the columns of one array. '''
+        if self.aggregation == "count":
+            return np.empty((len(cloud), 0))
+        widths = [int(np.prod(shape)) for _, shape, _ in self._attr_specs]
+        values = np.empty((len(cloud), 3 + 3 * self.has_rgb + sum(widths)), dtype=np.float64)
+        values[:, 0:3] = xyz
+        col = 3
+        if self.has_rgb:
+            values[:, 3:6] = 0 if cloud.rgb is None else cloud.rgb
+            col = 6
+        for (name, _, _), width in zip(self._attr_specs, widths):
+            values[:, col:col + width] = cloud.attrs[name].reshape(len(cloud), width)
+            col += width
+        return values
+
+    def add(self, cloud, T=None):
+        ''' Add an ArrayCloud, transformed by the 4x4 T if not None. '''
+        if self._attr_specs is None:
+            self._set_layout(cloud)
+        xyz = cloud.xyz if T is None else \
+            _transform_points(cloud.xyz, T, np.empty_like(cloud.xyz))
+        reduce_func = self.REDUCTIONS[self.aggregation]
+        keys, values, counts = reduce_func(
+            voxel_keys(xyz, self.voxel_size), self._pack(cloud, xyz), np.ones(len(cloud)))
+        if self._keys is not None:  # Merge with the previous voxels
+            keys, values, counts = reduce_func(
+                np.concatenate((self._keys, keys)),
+                np.vstack((self._values, values)),
+                np.concatenate((self._counts, counts)))
+        self._keys, self._values, self._counts = keys, values, counts
+        return self
+
+    def __len__(self):
+        return 0 if self._keys is None else self._keys.size
+
+    def result(self):
+        ''' Return the downsampled ArrayCloud, sorted by voxel key. '''
+        if self._keys is None:
+            return ArrayCloud(np.zeros((0, 3)), np.zeros((0, 3)) if self.has_rgb else None)
+        if self.aggregation == "count":
+            return ArrayCloud(voxel_centers(self._keys, self.voxel_size), None,
+                              {"count": self._counts.astype(np.int64)})
+        values = self._values
+        if self.aggregation == "centroid":
+            values = values / self._counts[:, np.newaxis]
+        attrs = {}
+        col = 6 if self.has_rgb else 3
+        for name, shape, dtype in self._attr_specs:
+            width = int(np.prod(shape))
+            attrs[name] = values[:, col:col + width].reshape(
+                (values.shape[0], ) + shape).astype(dtype)
+            col += width
+        return ArrayCloud(values[:, 0:3], values[:, 3:6] if self.has_rgb else None, attrs)
+
+
+def voxel_downsample(cloud, voxel_size, aggregation="centroid", chunk_size=None):
+    ''' Downsample an ArrayCloud by a VoxelGrid.
+    If chunk_size is set, the cloud is added in slices (views) of chunk_size points,
+    e.g., for a cloud memory-mapped from .npy files which doesn't fit in memory. '''
+    grid = VoxelGrid(voxel_size, aggregation)
+    chunk_size = chunk_size or max(len(cloud), 1)
+    for start in range(0, len(cloud), chunk_size):
+        grid.add(cloud[start:start + chunk_size])
+    return grid.result()
+
+# -------------- Merge --------------
+
+
+def _transform_points(xyz, T, out):
+    ''' Write xyz transformed by the 4x4 T (or a copy if T is None) into out. '''
+    if T is None:
+        out[...] = xyz
+    else:
+        T = np.asarray(T, dtype=out.dtype)
+        np.dot(xyz, T[0:3, 0:3].T, out=out)
+        out += T[0:3, 3]
+    return out
+
+
+def _merge_open3d_clouds(clouds, transforms, voxel_size):
+    ''' Merge open3d clouds in float64, the same as open3d stores them.
+    The output is allocated once, and each cloud's transform is applied
+    while its points are written into the output.
+    Clouds without colors are black. '''
+    arrays = [get_cloud_xyzrgb(cloud) for cloud in clouds]
+    total = sum(xyz.shape[0] for xyz, _ in arrays)
+    out_xyz = np.empty((total, 3))
+    out_rgb = np.zeros((total, 3))
+    start = 0
+    for (xyz, rgb), T in zip(arrays, transforms):
+        end = start + xyz.shape[0]
+        _transform_points(xyz, T, out_xyz[start:end])
+        if rgb.shape[0] == xyz.shape[0]:
+            out_rgb[start:end] = rgb
+        start = end
+    result = form_cloud(out_xyz, out_rgb)
+    if voxel_size is not None:
+        result = open3d.voxel_down_sample(result, voxel_size)
+    return result
+
+
+def merge_array_clouds(clouds, transforms=None, voxel_size=None):
+    ''' Merge ArrayClouds into one ArrayCloud.
+    Arguments:
+        transforms {list}: a 4x4 transform or None for each cloud,
+            applied while the cloud is written into the output.
+        voxel_size {float}: If not None, the output has one point per voxel,
+            whose xyz/rgb/attributes are the averages of the points in the voxel.
+            Each cloud is reduced by a VoxelGrid before the next one is added,
+            so the full-resolution merged cloud is never created.
+    The output has rgb if any input has rgb (missing rgb is black),
+    and keeps the attributes that all inputs have.
+    '''
+    transforms = transforms or [None] * len(clouds)
+    has_rgb = any(c.rgb is not None for c in clouds)
+    attr_names = [name for name in clouds[0].attrs
+                  if all(name in c.attrs for c in clouds)] if clouds else []
+
+    if voxel_size is None:
+        # Allocate the output once, and write each cloud into its rows.
+        total = sum(len(c) for c in clouds)
+        xyz = np.empty((total, 3), dtype=np.float32)
+        rgb = np.zeros((total, 3), dtype=np.float32) if has_rgb else None
+        attrs = {}
+        for name in attr_names:
+            values = clouds[0].attrs[name]
+            attrs[name] = np.empty((total, ) + values.shape[1:], dtype=values.dtype)
+        start = 0
+        for cloud, T in zip(clouds, transforms):
+            end = start + len(cloud)
+            _transform_points(cloud.xyz, T, xyz[start:end])
+            if cloud.rgb is not None:
+                rgb[start:end] = cloud.rgb
+            for name in attr_names:
+                attrs[name][start:end] = cloud.attrs[name]
+            start = end
+        return ArrayCloud(xyz, rgb, attrs)
+
+    grid = VoxelGrid(voxel_size, "centroid", has_rgb, attr_names)
+    for cloud, T in zip(clouds, transforms):
+        grid.add(cloud, T)
+    return grid.result()
+
 # -------------- Display ----------------
 
 
@@ -130,25 +448,138 @@ def draw_cloud_with_coord(
 # -------------- Filters ----------------
 
 
+class CloudFilter(object):
+    ''' Base class of a declarative point filter.
+    A filter evaluates `mask(points)` on a (N, 3) array in one pass and
+    returns a bool array of shape (N, ). Filters can be composed with
+    `&` (and), `|` (or) and `~` (not).
+    '''
+
+    def mask(self, points):
+        raise NotImplementedError
+
+    def __and__(self, other):
+        return AndFilter(self, other)
+
+    def __or__(self, other):
+        return OrFilter(self, other)
+
+    def __invert__(self):
+        return NotFilter(self)
+
+
+class RangeFilter(CloudFilter):
+    ''' Keep points whose x/y/z are inside [min, max]. None means no bound. '''
+
+    def __init__(self, xmin=None, xmax=None,
+                 ymin=None, ymax=None, zmin=None, zmax=None):
+        self.bounds = [(0, xmin, xmax), (1, ymin, ymax), (2, zmin, zmax)]
+
+    def mask(self, points):
+        valid = np.ones(points.shape[0], dtype=bool)
+        for axis, vmin, vmax in self.bounds:
+            if vmin is not None:
+                valid &= points[:, axis] >= vmin
+            if vmax is not None:
+                valid &= points[:, axis] <= vmax
+        return valid
+
+
+class BoxFilter(CloudFilter):
+    ''' Keep points inside an axis-aligned box [min_xyz, max_xyz]. '''
+
+    def __init__(self, min_xyz, max_xyz):
+        self.min_xyz = np.asarray(min_xyz, dtype=np.float64)
+        self.max_xyz = np.asarray(max_xyz, dtype=np.float64)
+
+    def mask(self, points):
+        return np.all((points >= self.min_xyz) & (points <= self.max_xyz), axis=1)
+
+
+class OrientedBoxFilter(CloudFilter):
+    ''' Keep points inside a box of `size` (length, width, height),
+    which is centered at the origin of the 4x4 `pose`.
+    E.g.: the volume of a tote is OrientedBoxFilter(tote.get_pose(),
+        (tote.length, tote.width, tote.height)).
+    '''
+
+    def __init__(self, pose, size):
+        pose = np.asarray(pose, dtype=np.float64)
+        self.R = pose[0:3, 0:3]
+        self.t = pose[0:3, 3]
+        self.half_size = np.asarray(size, dtype=np.float64) / 2.0
+
+    def mask(self, points):
+        # Express points in the box frame: R^T * (p - t)
+        local = (points - self.t).dot(self.R)
+        return np.all(np.abs(local) <= self.half_size, axis=1)
+
+
+class SphereFilter(CloudFilter):
+    ''' Keep points within `radius` of `center`. '''
+
+    def __init__(self, center, radius):
+        self.center = np.asarray(center, dtype=np.float64)
+        self.radius = radius
+
+    def mask(self, points):
+        diff = points - self.center
+        return np.einsum('ij,ij->i', diff, diff) <= self.radius ** 2
+
+
+class AndFilter(CloudFilter):
+    def __init__(self, *filters):
+        self.filters = filters
+
+    def mask(self, points):
+        valid = np.ones(points.shape[0], dtype=bool)
+        for f in self.filters:
+            valid &= f.mask(points)
+        return valid
+
+
+class OrFilter(CloudFilter):
+    def __init__(self, *filters):
+        self.filters = filters
+
+    def mask(self, points):
+        valid = np.zeros(points.shape[0], dtype=bool)
+        for f in self.filters:
+            valid |= f.mask(points)
+        return valid
+
+
+class NotFilter(CloudFilter):
+    def __init__(self, cloud_filter):
+        self.cloud_filter = cloud_filter
+
+    def mask(self, points):
+        return ~self.cloud_filter.mask(points)
+
+
+def filt_cloud_by_mask(cloud, mask):
+    points, colors = get_cloud_xyzrgb(cloud)
+    return form_cloud(points[mask, :], colors[mask, :])
+
+
 def filt_cloud_by_range(cloud, xmin=None, xmax=None,
                         ymin=None, ymax=None, zmin=None, zmax=None):
-    def none2maxnum(val): return +99999.9 if val is None else val
-    def none2minnum(val): return -99999.9 if val is None else val
-    xmax = none2maxnum(xmax)
-    ymax = none2maxnum(ymax)
-    zmax = none2maxnum(zmax)
-    xmin = none2minnum(xmin)
-    ymin = none2minnum(ymin)
-    zmin = none2minnum(zmin)
-    def criteria(x, y, z): return \
-        x >= xmin and x <= xmax and y >= ymin and y <= ymax and z >= zmin and z <= zmax
-    return filt_cloud(cloud, criteria)
+    return filt_cloud(cloud, RangeFilter(xmin, xmax, ymin, ymax, zmin, zmax))
 
 
 def filt_cloud(cloud, criteria):
+    ''' Filter the cloud by `criteria`, which is either:
+        (1) a CloudFilter, evaluated as a bool mask over all points at once, or
+        (2) a function criteria(x, y, z) -> bool, evaluated point by point.
+            This is slow and only kept for arbitrary criteria.
+    '''
     points, colors = get_cloud_xyzrgb(cloud)
+    if isinstance(criteria, CloudFilter):
+        mask = criteria.mask(points)
+        return form_cloud(points[mask, :], colors[mask, :])
+
     num_pts = points.shape[0]
-    valid_indices = np.zeros(num_pts, np.int)
+    valid_indices = np.zeros(num_pts, int)
     cnt_valid = 0
     for i in range(num_pts):
         x, y, z = points[i][0], points[i][1], points[i][2]
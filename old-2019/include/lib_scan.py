@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+''' Scan directories once with os.scandir, with cached stat results and an optional persistent index '''
+
+import os
+import re
+import json
+import fnmatch
+from collections import namedtuple
+
+try:
+    from os import scandir
+except ImportError:  # Python 2
+    try:
+        from scandir import scandir  # pip install scandir
+    except ImportError:
+        scandir = None
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # Python 2 without `pip install futures`
+    ThreadPoolExecutor = None
+
+
+# An entry of a directory.
+# size and mtime are None if the entry is scanned with `with_stat=False`.
+FileEntry = namedtuple("FileEntry", ["path", "name", "is_dir", "size", "mtime"])
+
+
+def natural_key(s):
+    ''' Sort key of a string, comparing the numbers in it by value.
+    e.g.: "img2.jpg" < "img10.jpg" '''
+    return [int(t) if t.isdigit() else t for t in re.split(r'(\d+)', s)]
+
+
+def _list_dir(folder, with_stat=True):
+    ''' List all entries of a folder (not recursive), one stat call per entry at most. '''
+    entries = []
+    if scandir is not None:
+        for e in scandir(folder):
+            is_dir = e.is_dir()
+            if with_stat:
+                st = e.stat()
+                entries.append(FileEntry(e.path, e.name, is_dir, st.st_size, st.st_mtime))
+            else:
+                entries.append(FileEntry(e.path, e.name, is_dir, None, None))
+    else:
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if with_stat:
+                st = os.stat(path)
+                is_dir = os.path.isdir(path)
+                entries.append(FileEntry(path, name, is_dir, st.st_size, st.st_mtime))
+            else:
+                entries.append(FileEntry(path, name, os.path.isdir(path), None, None))
+    return entries
+
+
+def _walk(folder, recursive, list_dir, num_workers):
+    ''' List the entries of the folder, and of all its subfolders if recursive.
+    The subfolders of each level are listed in parallel by num_workers threads. '''
+    if not recursive:
+        return list_dir(folder)
+    results = []
+    level = [folder]
+    pool = None
+    if num_workers > 1 and ThreadPoolExecutor is not None:
+        pool = ThreadPoolExecutor(max_workers=num_workers)
+    try:
+        while level:
+            if pool is not None and len(level) > 1:
+                listed = list(pool.map(list_dir, level))
+            else:
+                listed = [list_dir(f) for f in level]
+            level = []
+            for entries in listed:
+                results.extend(entries)
+                level.extend(e.path for e in entries
+                             if e.is_dir and not e.name.startswith('.'))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return results
+
+
+def _stat_entries(entries):
+    ''' Fill in the size and mtime of the entries which were listed without stat. '''
+    res = []
+    for e in entries:
+        st = os.stat(e.path)
+        res.append(e._replace(size=st.st_size, mtime=st.st_mtime))
+    return res
+
+
+def _compile_patterns(patterns):
+    ''' Compile the glob patterns into one regex, or return None for all names. '''
+    if patterns is None:
+        return None
+    if not isinstance(patterns, (list, tuple)):
+        patterns = [patterns]
+    if not patterns:
+        return None
+    return re.compile("|".join("(?:{})".format(fnmatch.translate(p)) for p in patterns))
+
+
+def _filter_and_sort(entries, patterns, include_dirs, sort):
+    ''' Same as glob: names starting with '.' are skipped, and patterns are case sensitive. '''
+    regex = _compile_patterns(patterns)
+    res = []
+    for e in entries:
+        if e.name.startswith('.') or (e.is_dir and not include_dirs):
+            continue
+        if regex is not None and not regex.match(e.name):
+            continue
+        res.append(e)
+    if sort == "natural":
+        res.sort(key=lambda e: natural_key(e.path))
+    elif sort == "name":
+        res.sort(key=lambda e: e.path)
+    elif sort is not None:
+        raise ValueError("Invalid sort: " + str(sort))
+    return res
+
+
+def scan_dir(folder, patterns=None, recursive=False, include_dirs=False,
+             sort="natural", with_stat=True, num_workers=1):
+    ''' Scan a folder once, and return the entries matching any of the patterns.
+    Arguments:
+        patterns {str or list}: e.g., ["*.jpg", "*.png"]. None for all files.
+        sort {str}: "natural", "name" (same as sorted(glob.glob(...))), or None.
+        with_stat {bool}: Get the size and mtime of the matched entries.
+            Only the matched entries are stat'ed.
+        num_workers {int}: Number of threads for listing subfolders when recursive.
+    Return:
+        entries {list of FileEntry}
+    '''
+    entries = _walk(folder, recursive,
+                    lambda f: _list_dir(f, with_stat=False), num_workers)
+    entries = _filter_and_sort(entries, patterns, include_dirs, sort)
+    return _stat_entries(entries) if with_stat else entries
+
+
+def get_filenames(folder, patterns=None, **kwargs):
+    ''' Same as scan_dir, but return the paths only, without any stat call. '''
+    kwargs.setdefault("with_stat", False)
+    return [e.path for e in scan_dir(folder, patterns, **kwargs)]
+
+
+class ScanIndex(object):
+    ''' A persistent index of the scanned folders.
+    A folder is only listed again if its mtime has changed, i.e., an entry
+    was added, removed, or renamed. Stat results of files whose content has
+    changed in place are not refreshed.
+
+    Usage:
+        index = ScanIndex("/data/.scan_index.json")
+        filenames = index.get_filenames("/data/images", ["*.jpg"], recursive=True)
+        index.save()
+    '''
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._folders = {}  # {folder: {"mtime": dir_mtime, "entries": [[name, is_dir, size, mtime]]}}
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as f:
+                self._folders = json.load(f)
+
+    def _list_dir(self, folder):
+        mtime = os.stat(folder).st_mtime
+        cached = self._folders.get(folder)
+        if cached is not None and cached["mtime"] == mtime:
+            return [FileEntry(os.path.join(folder, name), name, is_dir, size, t)
+                    for name, is_dir, size, t in cached["entries"]]
+        entries = _list_dir(folder, with_stat=True)
+        self._folders[folder] = {
+            "mtime": mtime,
+            "entries": [[e.name, e.is_dir, e.size, e.mtime] for e in entries]}
+        return entries
+
+    def scan_dir(self, folder, patterns=None, recursive=False, include_dirs=False,
+                 sort="natural", num_workers=1):
+        ''' Same as scan_dir, but only lists the folders that have changed. '''
+        entries = _walk(folder, recursive, self._list_dir, num_workers)
+        return _filter_and_sort(entries, patterns, include_dirs, sort)
+
+    def get_filenames(self, folder, patterns=None, **kwargs):
+        return [e.path for e in self.scan_dir(folder, patterns, **kwargs)]
+
+    def save(self):
+        ''' Write the index to a temporary file and then rename it. '''
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._folders, f)
+        getattr(os, "replace", os.rename)(tmp_path, self.index_path)
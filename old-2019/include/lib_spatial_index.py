@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+''' Spatial index of 3D points for radius and k-nearest-neighbor queries '''
+
+import itertools
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+from include.lib_point_cloud import ArrayCloud, voxel_index_to_keys
+
+# The voxel backend searches at most this many shells of cells around a k-NN query,
+# and then searches again in cells COARSE_FACTOR times larger.
+MAX_KNN_RING = 3
+COARSE_FACTOR = 4
+
+
+def _as_points(points):
+    ''' Return the (N, 3) float64 xyz of an ArrayCloud or an array. '''
+    if isinstance(points, ArrayCloud):
+        points = points.xyz
+    return np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+
+def _shell_offsets(ring, inner=-1):
+    ''' The (K, 3) offsets of the cells whose ring (max of |offset| on the 3 axes)
+    is in (inner, ring]. The default is all cells within the ring. '''
+    r = np.arange(-ring, ring + 1)
+    offsets = np.stack(np.meshgrid(r, r, r, indexing="ij"), axis=-1).reshape(-1, 3)
+    return offsets[np.abs(offsets).max(axis=1) > inner]
+
+
+def _group_by_query(query_ids, point_ids, num_queries):
+    ''' Convert pairs of (query id, point id) to a list of sorted point ids of each query. '''
+    order = np.lexsort((point_ids, query_ids))
+    counts = np.bincount(query_ids, minlength=num_queries)
+    return np.split(point_ids[order], np.cumsum(counts)[:-1])
+
+
+def _select_knn(query_ids, point_ids, dists, num_queries, k, chunk_size=1 << 22):
+    ''' Keep the k nearest (query id, point id) pairs of each query.
+    Return (dists, indices) of shape (num_queries, k), padded with inf and -1.
+    Instead of sorting all pairs, the candidates of each query are put into a row
+    and partitioned. The few queries with many more candidates are done one by one. '''
+    res_dists = np.full((num_queries, k), np.inf)
+    res_indices = np.full((num_queries, k), -1, dtype=np.int64)
+    if query_ids.size == 0:
+        return res_dists, res_indices
+    # Fast, since the pairs are mostly grouped by query already
+    order = np.argsort(query_ids, kind="mergesort")
+    query_ids, point_ids, dists = query_ids[order], point_ids[order], dists[order]
+    counts = np.bincount(query_ids, minlength=num_queries)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    width = max(k, int(np.percentile(counts, 99)))
+
+    for i in np.flatnonzero(counts > width):
+        d = dists[starts[i]:ends[i]]
+        sel = np.argpartition(d, k - 1)[:k]
+        sel = sel[np.argsort(d[sel], kind="mergesort")]
+        res_dists[i], res_indices[i] = d[sel], point_ids[starts[i]:ends[i]][sel]
+
+    rows_all = np.flatnonzero(counts <= width)
+    step = max(1, chunk_size // width)
+    for chunk_start in range(0, rows_all.size, step):
+        rows = rows_all[chunk_start:chunk_start + step]
+        c = counts[rows]
+        row_of = np.repeat(np.arange(rows.size), c)
+        cols = np.arange(c.sum()) - np.repeat(np.cumsum(c) - c, c)
+        pos = starts[rows][row_of] + cols
+        d = np.full((rows.size, width), np.inf)
+        ids = np.full((rows.size, width), -1, dtype=np.int64)
+        d[row_of, cols], ids[row_of, cols] = dists[pos], point_ids[pos]
+        r = np.arange(rows.size)[:, np.newaxis]
+        sel = np.argpartition(d, k - 1, axis=1)[:, :k]
+        sel = sel[r, np.argsort(d[r, sel], axis=1, kind="mergesort")]
+        res_dists[rows], res_indices[rows] = d[r, sel], ids[r, sel]
+    return res_dists, res_indices
+
+
+class _Level(object):
+    ''' A static index of a block of points, whose ids are [start, start + len(points)). '''
+
+    def __init__(self, points, start, backend, cell_size):
+        self.points = points
+        self.start = start
+        self.backend = backend
+        self.cell_size = cell_size
+        if backend == "kdtree":
+            self._tree = cKDTree(points)
+        else:
+            cells = self._cells_of(points)
+            keys = voxel_index_to_keys(cells)
+            self._order = np.argsort(keys, kind="mergesort")
+            self._cell_keys, self._cell_starts = np.unique(
+                keys[self._order], return_index=True)
+            self._cell_ends = np.append(self._cell_starts[1:], points.shape[0])
+            self._min_cell, self._max_cell = cells.min(axis=0), cells.max(axis=0)
+            self._coarse = None
+
+    def __len__(self):
+        return self.points.shape[0]
+
+    def _cells_of(self, points):
+        return np.floor(points / self.cell_size).astype(np.int64)
+
+    def _voxel_pairs(self, queries, offsets, query_ids=None):
+        ''' The pairs of (query id, local point id) of the points in the cells
+        at the (K, 3) `offsets` from the query's cell, for all queries and offsets at once. '''
+        query_ids = np.arange(queries.shape[0]) if query_ids is None else query_ids
+        cells = self._cells_of(queries)
+        keys = voxel_index_to_keys((cells[:, np.newaxis, :] + offsets).reshape(-1, 3))
+        pos = np.minimum(np.searchsorted(self._cell_keys, keys), self._cell_keys.size - 1)
+        found = np.flatnonzero(self._cell_keys[pos] == keys)
+        starts = self._cell_starts[pos[found]]
+        lengths = self._cell_ends[pos[found]] - starts
+        # Expand each [start, end) of the cells into the point ids
+        offsets_in_cell = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        q = np.repeat(query_ids[found // offsets.shape[0]], lengths)
+        p = self._order[np.repeat(starts, lengths) + offsets_in_cell]
+        return q, p
+
+    def radius_pairs(self, queries, radius):
+        ''' The pairs of (query id, point id) within radius. '''
+        if self.backend == "kdtree":
+            lists = self._tree.query_ball_point(queries, radius)
+            lengths = np.array([len(l) for l in lists], dtype=np.int64)
+            q = np.repeat(np.arange(queries.shape[0]), lengths)
+            p = np.fromiter(itertools.chain.from_iterable(lists), np.int64, lengths.sum())
+        else:
+            ring = int(np.ceil(radius / self.cell_size))
+            q, p = self._voxel_pairs(queries, _shell_offsets(ring))
+            diff = queries[q] - self.points[p]
+            valid = np.einsum('ij,ij->i', diff, diff) <= radius ** 2
+            q, p = q[valid], p[valid]
+        return q, p + self.start
+
+    def count_radius(self, queries, radius):
+        if self.backend == "kdtree":
+            return np.asarray(self._tree.query_ball_point(
+                queries, radius, return_length=True), dtype=np.int64)
+        q, _ = self.radius_pairs(queries, radius)
+        return np.bincount(q, minlength=queries.shape[0])
+
+    def query_knn(self, queries, k):
+        ''' Return (dists, point ids) of shape (M, k), padded with inf and -1. '''
+        num_queries = queries.shape[0]
+        if self.backend == "voxel":
+            dists, ids = self._voxel_knn(queries, k)
+        else:
+            dists = np.full((num_queries, k), np.inf)
+            ids = np.full((num_queries, k), -1, dtype=np.int64)
+            kk = min(k, len(self))
+            d, i = self._tree.query(queries, k=kk)
+            dists[:, :kk], ids[:, :kk] = d.reshape(num_queries, kk), i.reshape(num_queries, kk)
+        ids[ids >= 0] += self.start
+        return dists, ids
+
+    def _voxel_knn(self, queries, k):
+        ''' Search the cells shell by shell around each query, until the k-th nearest
+        candidate is closer than the searched shells, or they cover all points.
+        The queries not resolved within MAX_KNN_RING shells, e.g., the outliers far
+        from the points, are searched again in a coarser grid of the same points. '''
+        num_queries = queries.shape[0]
+        dists = np.full((num_queries, k), np.inf)
+        ids = np.full((num_queries, k), -1, dtype=np.int64)
+        cells = self._cells_of(queries)
+        # The rings of the nearest and the farthest occupied cells
+        near_ring = np.maximum(np.maximum(self._min_cell - cells, cells - self._max_cell), 0).max(axis=1)
+        far_ring = np.maximum(np.abs(cells - self._min_cell),
+                              np.abs(cells - self._max_cell)).max(axis=1)
+        todo = np.flatnonzero(near_ring <= MAX_KNN_RING)
+        coarse = [np.flatnonzero(near_ring > MAX_KNN_RING)]
+        for ring in range(1, MAX_KNN_RING + 1):
+            if todo.size == 0:
+                break
+            inner = ring - 1 if ring > 1 else -1  # The first shell includes the query's cell
+            q, p = self._voxel_pairs(queries[todo], _shell_offsets(ring, inner))
+            diff = queries[todo[q]] - self.points[p]
+            d = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+            # Merge with the candidates in the inner shells
+            valid = ids[todo] >= 0
+            q = np.concatenate((np.nonzero(valid)[0], q))
+            p = np.concatenate((ids[todo][valid], p))
+            d = np.concatenate((dists[todo][valid], d))
+            dists[todo], ids[todo] = _select_knn(q, p, d, todo.size, k)
+            # Any point outside the shells is farther than ring * cell_size
+            done = (dists[todo, -1] <= ring * self.cell_size) | (far_ring[todo] <= ring)
+            todo = todo[~done]
+        coarse = np.concatenate(coarse + [todo])
+        if coarse.size:
+            dists[coarse], ids[coarse] = self._coarse_level()._voxel_knn(queries[coarse], k)
+        return dists, ids
+
+    def _coarse_level(self):
+        ''' The same points in cells COARSE_FACTOR times larger. Created when first needed. '''
+        if self._coarse is None:
+            self._coarse = _Level(self.points, 0, "voxel", self.cell_size * COARSE_FACTOR)
+        return self._coarse
+
+
+class SpatialIndex(object):
+    ''' A spatial index of 3D points, for batched radius and k-NN queries.
+
+    Backends:
+        "kdtree": scipy's cKDTree. The default if scipy is installed.
+        "voxel": A uniform voxel hash of `cell_size`, built on sorted voxel keys.
+            Queries only check the points in the nearby cells.
+            cell_size should be about the query radius.
+
+    Points can be inserted incrementally, e.g., as new sensor frames are merged.
+    Each insert indexes the new points as a new level, and the last levels are
+    merged (rebuilt as one) while the last one is at least half the size of the
+    one before it. So the level sizes at least double from the newest to the
+    oldest, a query searches at most log2(N) levels, and each point is rebuilt
+    at most log2(N) times.
+    Point ids are the order of insertion.
+
+    Usage:
+        index = SpatialIndex(cloud.xyz)
+        neighbors = index.query_radius(queries, radius=0.01)  # list of arrays of point ids
+        dists, ids = index.query_knn(queries, k=8)  # (M, 8) arrays
+        index.insert(new_frame.xyz)
+    '''
+
+    def __init__(self, points=None, cell_size=None, backend=None):
+        if backend is None:
+            backend = "kdtree" if cKDTree is not None else "voxel"
+        if backend == "kdtree" and cKDTree is None:
+            raise ImportError("The kdtree backend requires scipy: pip install scipy")
+        if backend == "voxel" and cell_size is None:
+            raise ValueError("The voxel backend requires a cell_size")
+        if backend not in ("kdtree", "voxel"):
+            raise ValueError("Invalid backend: " + str(backend))
+        self.backend = backend
+        self.cell_size = cell_size
+        self._buffer = np.empty((0, 3), dtype=np.float64)
+        self._size = 0
+        self._levels = []
+        if points is not None:
+            self.insert(points)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def points(self):
+        return self._buffer[:self._size]
+
+    def insert(self, points):
+        ''' Append points to the index. Return the ids of the new points. '''
+        points = _as_points(points)
+        start, end = self._size, self._size + points.shape[0]
+        if end > self._buffer.shape[0]:  # Grow the buffer by doubling
+            buffer = np.empty((max(end, 2 * self._buffer.shape[0]), 3), dtype=np.float64)
+            buffer[:start] = self._buffer[:start]
+            self._buffer = buffer
+        self._buffer[start:end] = points
+        self._size = end
+        if end > start:
+            self._levels.append(self._create_level(start))
+            while len(self._levels) >= 2 and \
+                    2 * len(self._levels[-1]) >= len(self._levels[-2]):
+                merged_start = self._levels[-2].start
+                del self._levels[-2:]
+                self._levels.append(self._create_level(merged_start))
+        return np.arange(start, end)
+
+    def build(self):
+        ''' Rebuild all points as one level, for the fastest queries. '''
+        if len(self._levels) > 1:
+            self._levels = [self._create_level(0)]
+
+    def _create_level(self, start):
+        ''' Index the points from `start` to the end. '''
+        return _Level(self._buffer[start:self._size], start, self.backend, self.cell_size)
+
+    # -- Queries
+
+    def query_radius(self, queries, radius, chunk_size=100000):
+        ''' Return a list of the sorted ids of the points within radius of each query. '''
+        queries = _as_points(queries)
+        res = []
+        for start in range(0, queries.shape[0], chunk_size):
+            chunk = queries[start:start + chunk_size]
+            pairs = [level.radius_pairs(chunk, radius) for level in self._levels]
+            q = np.concatenate([np.zeros(0, np.int64)] + [q for q, _ in pairs])
+            p = np.concatenate([np.zeros(0, np.int64)] + [p for _, p in pairs])
+            res.extend(_group_by_query(q, p, chunk.shape[0]))
+        return res
+
+    def count_radius(self, queries, radius, chunk_size=100000):
+        ''' Return the number of points within radius of each query. '''
+        queries = _as_points(queries)
+        counts = np.zeros(queries.shape[0], dtype=np.int64)
+        for start in range(0, queries.shape[0], chunk_size):
+            chunk = queries[start:start + chunk_size]
+            for level in self._levels:
+                counts[start:start + chunk.shape[0]] += level.count_radius(chunk, radius)
+        return counts
+
+    def query_knn(self, queries, k, chunk_size=100000):
+        ''' Return (dists, ids) of the k nearest points of each query, both of shape (M, k),
+        sorted by distance. If there are fewer than k points, they are padded with inf and -1. '''
+        queries = _as_points(queries)
+        res_dists = np.full((queries.shape[0], k), np.inf)
+        res_ids = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        for start in range(0, queries.shape[0], chunk_size):
+            chunk = queries[start:start + chunk_size]
+            end = start + chunk.shape[0]
+            results = [level.query_knn(chunk, k) for level in self._levels]
+            if len(results) == 1:
+                res_dists[start:end], res_ids[start:end] = results[0]
+            elif results:
+                # Keep the k nearest of the (M, k * num_levels) candidates of each query
+                dists = np.hstack([d for d, _ in results])
+                ids = np.hstack([i for _, i in results])
+                order = np.argsort(dists, axis=1, kind="mergesort")[:, :k]
+                rows = np.arange(chunk.shape[0])[:, np.newaxis]
+                res_dists[start:end], res_ids[start:end] = dists[rows, order], ids[rows, order]
+        return res_dists, res_ids
+
+
+# -------------- Outlier removal ----------------
+
+
+def remove_statistical_outliers(points, k=20, std_ratio=2.0, index=None):
+    ''' Return a bool mask of the inliers, the points whose mean distance to their
+    k nearest neighbors is within `std_ratio` standard deviations of the average.
+    Usage:
+        cloud = cloud[remove_statistical_outliers(cloud)]
+    '''
+    points = _as_points(points)
+    if index is None:
+        index = SpatialIndex(points, cell_size=_guess_cell_size(points, k))
+    dists, _ = index.query_knn(points, k + 1)  # The nearest one is the point itself
+    mean_dists = dists[:, 1:].mean(axis=1)
+    valid = np.isfinite(mean_dists)
+    threshold = mean_dists[valid].mean() + std_ratio * mean_dists[valid].std()
+    return valid & (mean_dists <= threshold)
+
+
+def remove_radius_outliers(points, radius, min_neighbors, index=None):
+    ''' Return a bool mask of the inliers, the points which have at least
+    `min_neighbors` other points within `radius`. '''
+    points = _as_points(points)
+    if index is None:
+        index = SpatialIndex(points, cell_size=radius)
+    return index.count_radius(points, radius) - 1 >= min_neighbors
+
+
+def _guess_cell_size(points, k):
+    ''' A cell size for the voxel backend, with about k points per cell on average,
+    assuming the points are on surfaces. '''
+    if points.shape[0] == 0:
+        return 1.0
+    # The percentiles are not affected by the few outliers far from the points
+    low, high = np.percentile(points, [1, 99], axis=0)
+    extent = np.maximum(high - low, 1e-6)
+    area = np.sort(extent)[1:].prod()  # The 2 largest sides
+    return float(np.sqrt(area * k / points.shape[0]))
@@ -1,6 +1,5 @@
 import cv2
 import numpy as np
-import glob
 import os
 from datetime import datetime
 import time
@@ -8,6 +7,7 @@ import io
 import yaml
 import types
 from shutil import copyfile
+import include.lib_scan as lib_scan
 
 
 def check_and_get_basename(path):
@@ -125,11 +125,8 @@ def split_name(name):
 
 
 def get_filenames(folder, file_types=('*.jpg', '*.png')):
-    filenames = []
-    for file_type in file_types:
-        filenames.extend(glob.glob(folder + "/" + file_type))
-    filenames.sort()
-    return filenames
+    # One scan of the folder for all file types, sorted in the same order as before
+    return lib_scan.get_filenames(folder, list(file_types), sort="name")
 
 
 class SimpleNamespace:
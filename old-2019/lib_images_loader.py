@@ -73,11 +73,14 @@ class ReadFromFolder(object):
         None
 
 class ReadFromVideo(object):
-    def __init__(self, video_path, sample_interval=1):
+    def __init__(self, video_path, sample_interval=1, seek_threshold=30):
         ''' A video reader class for reading video frames from video.
         Arguments:
             video_path
             sample_interval {int}: sample every kth image.
+            seek_threshold {int}: If sample_interval >= seek_threshold,
+                jump to the next sampled frame by seeking. 
+                Otherwise, skip frames by grab() without retrieving them.
         '''
         if not os.path.exists(video_path):
             raise IOError("Video not exist: " + video_path)
@@ -87,7 +90,10 @@ class ReadFromVideo(object):
         self.video = cv2.VideoCapture(video_path)
         ret, frame = self.video.read()
         self.next_image = frame
+        self.next_frame_index = 0  # index of self.next_image in the video
+        self.curr_frame_index = -1  # index of the last returned image
         self.sample_interval = sample_interval
+        self.seek_threshold = seek_threshold
         self.fps = self.get_fps()
         if not self.fps >= 0.0001:
             import warnings
@@ -97,20 +103,47 @@ class ReadFromVideo(object):
         return self.next_image is not None
 
     def get_curr_video_time(self):
-        return 1.0 / self.fps * self.cnt_imgs
+        return 1.0 / self.fps * (self.curr_frame_index + 1)
 
     def read_image(self):
         image = self.next_image
-        for i in range(self.sample_interval):
-            if self.video.isOpened():
-                ret, frame = self.video.read()
-                self.next_image = frame
-            else:
-                self.next_image = None
-                break
+        self.curr_frame_index = self.next_frame_index
+        if self.sample_interval >= self.seek_threshold:
+            self._seek(self.next_frame_index + self.sample_interval)
+        else:
+            for i in range(self.sample_interval - 1):
+                self.video.grab()  # decode but don't retrieve the frame
+            self.next_frame_index += self.sample_interval
+        self.next_image = self._read_frame()
         self.cnt_imgs += 1
         return image
 
+    def seek_to_frame(self, frame_index):
+        ''' Make the next read_image() return the frame at frame_index. '''
+        self._seek(frame_index)
+        self.next_image = self._read_frame()
+
+    def seek_to_time(self, video_time):
+        ''' Make the next read_image() return the frame at video_time (seconds). '''
+        self.seek_to_frame(int(round(video_time * self.fps)))
+
+    def _seek(self, frame_index):
+        ''' Make the next self.video.read() return the frame at frame_index.
+        OpenCV seeks to the keyframe before it and only decodes from there,
+        instead of decoding all frames in between. '''
+        if not self.video.set(cv2.CAP_PROP_POS_FRAMES, frame_index):
+            # The backend can't seek. Skip frames one by one.
+            # After reading self.next_image, the video is at next_frame_index + 1.
+            for i in range(frame_index - self.next_frame_index - 1):
+                self.video.grab()
+        self.next_frame_index = frame_index
+
+    def _read_frame(self):
+        if self.video.isOpened():
+            ret, frame = self.video.read()
+            return frame
+        return None
+
     def stop(self):
         self.video.release()
         self.is_stoped = True
@@ -1,18 +1,17 @@
 
 import cv2
 import numpy as np
-import glob
 import sys
 import os
 import yaml
+import include.lib_scan as lib_scan
 
 
 def get_filenames(folder, filename_only=False):
-    fnames = glob.glob(folder + "/*")
+    entries = lib_scan.scan_dir(folder, include_dirs=True, sort="name", with_stat=False)
     if filename_only:
-        fnames = [s.split("/")[-1] for s in fnames]
-    fnames = sorted(fnames)
-    return fnames
+        return [e.name for e in entries]
+    return [e.path for e in entries]
 
 
 def makedirs(folders):
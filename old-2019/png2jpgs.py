@@ -1,46 +1,114 @@
+'''
+Convert all png images under a folder into jpg images.
+The folder structure is mirrored under the output folder,
+and the images are converted on a pool of processes.
+Outputs newer than their inputs are skipped.
+
+Example of usage:
+    python png2jpgs.py -i pngs/ -o jpgs/
+    python png2jpgs.py -i pngs/ -o jpgs/ -s --quality 90 --progressive --optimize
+'''
 
-import glob
 import cv2
 import argparse
 import os
+from multiprocessing import cpu_count
+from concurrent.futures import ProcessPoolExecutor
 
 SRC_FORMAT = "png"
 DST_FORMAT = "jpg"
 
 def parse_args():
     parser = argparse.ArgumentParser(
-        description="Convert a folder of images into a video.")
+        description="Convert a folder of png images into jpg images.")
     parser.add_argument("-i", "--src-folder", type=str, required=True)
     parser.add_argument("-o", "--dst-folder", type=str, required=True)
-    parser.add_argument("-s", "--is-including-subfolders", 
-                        type=str, required=False, default=False)
+    parser.add_argument("-s", "--is-including-subfolders",
+                        type=str, required=False, default=False,
+                        nargs="?", const="true",
+                        help="Also convert images in all subfolders.")
+    parser.add_argument("-q", "--quality", type=int, required=False,
+                        default=95, help="Jpeg quality 0~100. Default 95.")
+    parser.add_argument("--progressive", action="store_true",
+                        help="Write progressive jpegs.")
+    parser.add_argument("--optimize", action="store_true",
+                        help="Optimize the jpeg huffman tables.")
+    parser.add_argument("-w", "--workers", type=int, required=False,
+                        default=cpu_count(),
+                        help="Number of processes. Default: number of CPUs.")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="Also convert images whose output is up to date.")
 
     args = parser.parse_args()
     return args
 
-def renameImages(src_folder, dst_folder):
-    os.makedirs(dst_folder, exist_ok=True)
-    filenames = glob.glob(src_folder + "/*." + SRC_FORMAT)
-    for i, filename in enumerate(filenames):
-        img = cv2.imread(filename)
-        basename = "".join(os.path.basename(filename).split('.')[:-1])
-        new_name = dst_folder + "/" + basename + "." + DST_FORMAT
-        cv2.imwrite(new_name, img)
-        print("{}/{}: Save image to {}".format(
-            i, len(filenames), new_name))
+def find_images(src_folder, dst_folder, is_recursive):
+    ''' Return a list of (src_name, dst_name) of all images under src_folder. '''
+    pairs = []
+    for root, dirs, files in os.walk(src_folder):
+        if not is_recursive:
+            dirs[:] = []
+        dirs.sort()
+        rel_folder = os.path.relpath(root, src_folder)
+        for filename in sorted(files):
+            if not filename.lower().endswith("." + SRC_FORMAT):
+                continue
+            basename = os.path.splitext(filename)[0]
+            new_name = os.path.normpath(os.path.join(
+                dst_folder, rel_folder, basename + "." + DST_FORMAT))
+            pairs.append((os.path.join(root, filename), new_name))
+    return pairs
+
+def is_up_to_date(src_name, dst_name):
+    return os.path.exists(dst_name) and \
+        os.path.getmtime(dst_name) >= os.path.getmtime(src_name)
+
+def convertImage(job):
+    ''' Convert one image. Return True if succeeded. '''
+    filename, new_name, params = job
+    img = cv2.imread(filename)
+    if img is None:
+        return False
+    os.makedirs(os.path.dirname(new_name), exist_ok=True)
+    tmp_name = new_name[:-len(DST_FORMAT)] + "tmp." + DST_FORMAT
+    if not cv2.imwrite(tmp_name, img, params):
+        return False
+    os.replace(tmp_name, new_name)
+    return True
+
+def renameImages(src_folder, dst_folder, is_recursive=False,
+                 quality=95, progressive=False, optimize=False,
+                 workers=None, force=False):
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality,
+              cv2.IMWRITE_JPEG_PROGRESSIVE, int(progressive),
+              cv2.IMWRITE_JPEG_OPTIMIZE, int(optimize)]
+    pairs = find_images(src_folder, dst_folder, is_recursive)
+    jobs = [(filename, new_name, params) for filename, new_name in pairs
+            if force or not is_up_to_date(filename, new_name)]
+    print("{} images, {} to convert, {} up to date.".format(
+        len(pairs), len(jobs), len(pairs) - len(jobs)))
+
+    workers = workers or cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, min(64, len(jobs) // (4 * workers)))
+        results = pool.map(convertImage, jobs, chunksize=chunksize)
+        for i, (job, is_ok) in enumerate(zip(jobs, results)):
+            if is_ok:
+                print("{}/{}: Save image to {}".format(
+                    i, len(jobs), job[1]))
+            else:
+                print("{}/{}: Failed to convert {}".format(
+                    i, len(jobs), job[0]))
 
 def main():
     args = parse_args()
-    
-    # Rename images under the folder
-    renameImages(args.src_folder, args.dst_folder)
-
-    # Rename images under the subfolders   
-    if args.is_including_subfolders in ["1", "true", "True", "Yes", "yes"]:
-        subfolders = [f for f in glob.glob(args.src_folder + "/*") if os.path.isdir(f)]
-        for src in subfolders:
-            dst = args.dst_folder + "/" + src.split("/")[-1]
-            renameImages(src, dst)
-            
+
+    # Convert images under the folder, and the subfolders if required
+    is_recursive = args.is_including_subfolders in [
+        "1", "true", "True", "Yes", "yes"]
+    renameImages(args.src_folder, args.dst_folder, is_recursive,
+                 args.quality, args.progressive, args.optimize,
+                 args.workers, args.force)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
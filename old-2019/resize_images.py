@@ -1,42 +1,192 @@
+'''
+Description:
+    Resize all images in a folder in parallel, and save them as jpg.
+    A manifest in the output folder records the input and the size of each output.
+    Outputs which still exist and whose input and size haven't changed are skipped,
+    so an interrupted run can be restarted without redoing the finished images.
+    (The {:05d}.jpg outputs shift when an input image is added or removed,
+    and then they are redone.)
+    Jpegs are decoded directly at 1/2, 1/4 or 1/8 of their size when possible.
 
+Example of usage:
+    python resize_images.py -i "/home/feiyu/Downloads/images/downloads/room images/" \
+        -o /home/feiyu/Downloads/images/downloads/out/ --height 480
+    python resize_images.py -i src/ -o dst/ --longest 1024 --keep_names
+    python resize_images.py -i src/ -o dst/ --scale 0.5 --workers 8
+'''
 
-import cv2 
-import glob 
-import numpy as np 
-import sys, os 
+import cv2
+import numpy as np
+import sys, os
+import json
+import argparse
+from multiprocessing import cpu_count
+from concurrent.futures import ProcessPoolExecutor
+import include.lib_images as lib_images
+import include.lib_scan as lib_scan
 
+MANIFEST_NAME = ".resize_manifest.json"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Resize a folder of images in parallel.")
+    parser.add_argument("-i", "--src", type=str, required=True,
+                        help="input folder")
+    parser.add_argument("-o", "--dst", type=str, required=True,
+                        help="output folder")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--height", type=int, help="target height. Default 480.")
+    size.add_argument("--width", type=int, help="target width")
+    size.add_argument("--longest", type=int, help="target longest side")
+    size.add_argument("--scale", type=float, help="resize rate")
+    parser.add_argument("-w", "--workers", type=int, required=False,
+                        default=cpu_count(),
+                        help="number of processes. Default: number of CPUs.")
+    parser.add_argument("--keep_names", action="store_true",
+                        help="name the outputs as ${input_name}.jpg, "
+                        "instead of {:05d}.jpg in the sorted order. "
+                        "Inputs which only differ in the extension are an error.")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="redo the outputs which are up to date.")
+    args = parser.parse_args()
+    if not (args.height or args.width or args.longest or args.scale):
+        args.height = 480
+    return args
 
-src = "/home/feiyu/Downloads/images/downloads/room images/"
-dst = "/home/feiyu/Downloads/images/downloads/out/"
 
 # Define functions
-def resize(img):
+def get_dst_size(r0, c0, height=None, width=None, longest=None, scale=None):
+    ''' Return the (rows, cols) of the resized image.
+    Only one of height/width/longest/scale should be set. '''
+    if height:
+        r_dst = height
+        c_dst = int(c0*r_dst/r0)
+    elif width:
+        c_dst = width
+        r_dst = int(r0*c_dst/c0)
+    elif longest:
+        ratio = 1.0 * longest / max(r0, c0)
+        r_dst, c_dst = int(r0*ratio), int(c0*ratio)
+    else:
+        r_dst, c_dst = int(r0*scale), int(c0*scale)
+    return max(r_dst, 1), max(c_dst, 1)
+
+
+def resize(img, height=480, width=None, longest=None, scale=None):
     r0, c0 = img.shape[0:2]
-    r_dst = 480
-    c_dst = int(c0*r_dst/r0)
+    r_dst, c_dst = get_dst_size(r0, c0, height, width, longest, scale)
     res = cv2.resize(img, (c_dst, r_dst))
-    return res 
+    return res
+
 
 def get_filenames3(folder, file_types=('*.jpg', '*.png')):
-    filenames = []
-    for file_type in file_types:
-        filenames.extend(glob.glob(folder + "/" + file_type))
-    filenames.sort()
-    return filenames
-
-
-# Check input
-if not os.path.exists(src):
-    raise ValueError('Invalid src folder.')
-if not os.path.exists(dst):
-    os.makedirs(dst)
-
-# Read image, resize, and then output
-format = ".jpg"
-src_files = get_filenames3(src)
-for i, f in enumerate(src_files):
-    img = cv2.imread(f, -1)
-    res = resize(img)
-    res_name = dst + "{:05d}.jpg".format(i)
-    cv2.imwrite(res_name, res)
-    print(i)
\ No newline at end of file
+    # One scan of the folder for all file types, sorted in the same order as before,
+    # which keeps the {:05d}.jpg numbering of the outputs.
+    return lib_scan.get_filenames(folder, list(file_types), sort="name")
+
+
+def load_manifest(dst_folder):
+    ''' Return {output name: [input path, input mtime, size]} of the finished outputs. '''
+    filename = os.path.join(dst_folder, MANIFEST_NAME)
+    if not os.path.exists(filename):
+        return {}
+    with open(filename) as f:
+        return json.load(f)
+
+
+def save_manifest(dst_folder, manifest):
+    filename = os.path.join(dst_folder, MANIFEST_NAME)
+    with open(filename + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(filename + ".tmp", filename)
+
+
+def get_manifest_record(src_name, size):
+    return [os.path.abspath(src_name), os.path.getmtime(src_name), size]
+
+
+def is_up_to_date(manifest, src_name, dst_name, size):
+    ''' The output exists, and was resized from the same input with the same size. '''
+    return os.path.exists(dst_name) and \
+        manifest.get(os.path.basename(dst_name)) == get_manifest_record(src_name, size)
+
+
+def resize_file(job):
+    ''' Read, resize, and write one image. Return the output name, or None if failed.
+    The image is first written to a temporary file and then renamed,
+    so an interrupted write never leaves a complete-looking output. '''
+    src_name, dst_name, size = job
+
+    def get_dsize(r0, c0):
+        r_dst, c_dst = get_dst_size(r0, c0, **size)
+        return c_dst, r_dst
+    res = lib_images.imread_scaled(src_name, dsize=get_dsize, flags=-1)
+    if res is None:
+        return None
+    root, ext = os.path.splitext(dst_name)
+    tmp_name = root + ".tmp" + ext
+    if not cv2.imwrite(tmp_name, res):
+        return None
+    os.replace(tmp_name, dst_name)
+    return dst_name
+
+
+def main(args):
+
+    # Check input
+    if not os.path.exists(args.src):
+        raise ValueError('Invalid src folder.')
+    if not os.path.exists(args.dst):
+        os.makedirs(args.dst)
+
+    # Skip the outputs which are up to date
+    format = ".jpg"
+    size = dict(height=args.height, width=args.width,
+                longest=args.longest, scale=args.scale)
+    src_files = get_filenames3(args.src)
+    if args.keep_names:
+        res_names = [os.path.join(args.dst, os.path.splitext(os.path.basename(f))[0] + format)
+                     for f in src_files]
+    else:
+        res_names = [os.path.join(args.dst, "{:05d}".format(i) + format)
+                     for i in range(len(src_files))]
+
+    # With --keep_names, e.g. a.jpg and a.png would both be saved as a.jpg
+    srcs_of_res = {}
+    for f, res_name in zip(src_files, res_names):
+        srcs_of_res.setdefault(res_name, []).append(f)
+    clashes = [(res_name, srcs) for res_name, srcs in srcs_of_res.items() if len(srcs) > 1]
+    if clashes:
+        raise ValueError("These inputs have the same output name: " + "; ".join(
+            "{} <- {}".format(os.path.basename(res_name), ", ".join(srcs))
+            for res_name, srcs in clashes))
+
+    manifest = load_manifest(args.dst)
+    jobs = []
+    for f, res_name in zip(src_files, res_names):
+        if args.force or not is_up_to_date(manifest, f, res_name, size):
+            manifest.pop(os.path.basename(res_name), None)
+            jobs.append((f, res_name, size))
+    print("{} images, {} to resize, {} up to date.".format(
+        len(src_files), len(jobs), len(src_files) - len(jobs)))
+
+    # Read image, resize, and then output.
+    # The manifest is saved even if interrupted, to keep the finished outputs.
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            chunksize = max(1, min(64, len(jobs) // (4 * args.workers)))
+            for i, (job, res_name) in enumerate(zip(
+                    jobs, pool.map(resize_file, jobs, chunksize=chunksize))):
+                if res_name is None:
+                    print("{}/{}: Failed to resize {}".format(i+1, len(jobs), job[0]))
+                else:
+                    manifest[os.path.basename(res_name)] = get_manifest_record(job[0], size)
+                    print("{}/{}: {}".format(i+1, len(jobs), res_name))
+    finally:
+        save_manifest(args.dst, manifest)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args)
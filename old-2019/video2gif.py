@@ -15,10 +15,18 @@ Example of usage:
         --start_time 0.0 \
         --end_time 10.0 \
         --resize_rate 0.5 \
-        --output_fps -1
+        --output_fps -1 \
+        --optimizer builtin
+
+    Frames are converted to RGB in memory and appended to the gif one by one,
+    so the memory doesn't grow with the clip length.
+    The gif is then optimized by either:
+        "gifsicle": write a temporary gif, and compress it by gifsicle (default).
+        "builtin": quantize the palette and only store the changed
+            sub-rectangle of each frame while writing. No gifsicle is needed.
         
 Dependency:
-    $ sudo apt install gifsicle
+    $ sudo apt install gifsicle  # only for "--optimizer gifsicle"
 
 Notes:
     Optimize gif: 
@@ -52,10 +60,15 @@ parser.add_argument("-of", "--output_fps", type=int, required=False,
                     default=-1,
                     help="At what fps to write video frames to gif. "
                     "Default -1, which is reset as `video_fps/sample_interval`.")
+parser.add_argument("-op", "--optimizer", type=str, required=False,
+                    default="gifsicle", choices=["gifsicle", "builtin"],
+                    help="How to optimize the gif. Default gifsicle.")
+parser.add_argument("-c", "--colors", type=int, required=False,
+                    default=256,
+                    help="Number of colors in the palette. Default 256.")
 
 CURR_PATH = os.path.dirname(os.path.abspath(__file__))
 
-tmp_image_filename = ".tmp.png"
 tmp_gif_filename = ".tmp.gif"
 
 
@@ -68,16 +81,21 @@ start_time = args.start_time
 end_time = args.end_time
 resize_rate = args.resize_rate
 output_fps = args.output_fps
+optimizer = args.optimizer
+colors = args.colors
 
 # --------------------------- Functions ---------------------------
 
 
 class ReadFromVideo(object):
-    def __init__(self, video_path, sample_interval=1):
+    def __init__(self, video_path, sample_interval=1, seek_threshold=30):
         ''' A video reader class for reading video frames from video.
         Arguments:
             video_path
             sample_interval {int}: sample every kth image.
+            seek_threshold {int}: If sample_interval >= seek_threshold,
+                jump to the next sampled frame by seeking. 
+                Otherwise, skip frames by grab() without retrieving them.
         '''
         if not os.path.exists(video_path):
             raise IOError("Video not exist: " + video_path)
@@ -87,7 +105,10 @@ class ReadFromVideo(object):
         self.video = cv2.VideoCapture(video_path)
         ret, frame = self.video.read()
         self.next_image = frame
+        self.next_frame_index = 0  # index of self.next_image in the video
+        self.curr_frame_index = -1  # index of the last returned image
         self.sample_interval = sample_interval
+        self.seek_threshold = seek_threshold
         self.fps = self.get_fps()
         if not self.fps >= 0.0001:
             import warnings
@@ -97,20 +118,47 @@ class ReadFromVideo(object):
         return self.next_image is not None
 
     def get_curr_video_time(self):
-        return 1.0 / self.fps * self.cnt_imgs
+        return 1.0 / self.fps * (self.curr_frame_index + 1)
 
     def read_image(self):
         image = self.next_image
-        for i in range(self.sample_interval):
-            if self.video.isOpened():
-                ret, frame = self.video.read()
-                self.next_image = frame
-            else:
-                self.next_image = None
-                break
+        self.curr_frame_index = self.next_frame_index
+        if self.sample_interval >= self.seek_threshold:
+            self._seek(self.next_frame_index + self.sample_interval)
+        else:
+            for i in range(self.sample_interval - 1):
+                self.video.grab()  # decode but don't retrieve the frame
+            self.next_frame_index += self.sample_interval
+        self.next_image = self._read_frame()
         self.cnt_imgs += 1
         return image
 
+    def seek_to_frame(self, frame_index):
+        ''' Make the next read_image() return the frame at frame_index. '''
+        self._seek(frame_index)
+        self.next_image = self._read_frame()
+
+    def seek_to_time(self, video_time):
+        ''' Make the next read_image() return the frame at video_time (seconds). '''
+        self.seek_to_frame(int(round(video_time * self.fps)))
+
+    def _seek(self, frame_index):
+        ''' Make the next self.video.read() return the frame at frame_index.
+        OpenCV seeks to the keyframe before it and only decodes from there,
+        instead of decoding all frames in between. '''
+        if not self.video.set(cv2.CAP_PROP_POS_FRAMES, frame_index):
+            # The backend can't seek. Skip frames one by one.
+            # After reading self.next_image, the video is at next_frame_index + 1.
+            for i in range(frame_index - self.next_frame_index - 1):
+                self.video.grab()
+        self.next_frame_index = frame_index
+
+    def _read_frame(self):
+        if self.video.isOpened():
+            ret, frame = self.video.read()
+            return frame
+        return None
+
     def stop(self):
         self.video.release()
         self.is_stoped = True
@@ -135,9 +183,29 @@ class ReadFromVideo(object):
         return fps
 
 
+def create_gif_writer(gif_path, fps, optimizer, colors):
+    ''' Create a gif writer, which writes each appended frame to the file. '''
+    if optimizer == "builtin":
+        return imageio.get_writer(
+            gif_path, mode="I", duration=1.0/fps,
+            palettesize=colors, quantizer="nq", subrectangles=True)
+    return imageio.get_writer(gif_path, mode="I", duration=1.0/fps)
+
+
 if __name__ == "__main__":
     video_reader = ReadFromVideo(input_video_path, sample_interval)
-    gif_images = []
+    if start_time > 0:  # jump to start_time instead of decoding all frames before it
+        video_reader.seek_to_time(start_time)
+    if output_fps == -1:
+        output_fps = 1.0 * video_reader.fps / sample_interval
+    if optimizer == "builtin":
+        gif_path = output_gif_path
+    else:
+        gif_path = tmp_gif_filename
+
+    # Write images to gif
+    print("\nStart writing images to gif ...")
+    gif_writer = create_gif_writer(gif_path, output_fps, optimizer, colors)
     cnt = 0
     while video_reader.has_image():
         image = video_reader.read_image()
@@ -146,30 +214,24 @@ if __name__ == "__main__":
             if video_time <= end_time:
                 cnt += 1
                 image = cv2.resize(image, dsize=None, fx=resize_rate, fy=resize_rate)
-                cv2.imwrite(tmp_image_filename, image)
                 print("Reading the {}th image".format(cnt))
-                gif_images.append(imageio.imread(tmp_image_filename))
+                gif_writer.append_data(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
             else:
                 break
-
-    # Write images to gif
-    if output_fps == -1:
-        output_fps = 1.0 * video_reader.fps / sample_interval
-    print("\nStart writing images to gif ...")
-    imageio.mimsave(tmp_gif_filename, gif_images, duration=1.0/output_fps)
-    
-    # Compress gif
-    print("\nStart compressing gif ...")
-    subprocess.call(["gifsicle",
-                     "-i", tmp_gif_filename,
-                     "-O3",
-                     "--colors", "256",
-                     "-o", output_gif_path])
-
-    # Delete tmp files
-    print("\nClean temporary files ...")
-    subprocess.call(["rm", tmp_gif_filename])
-    subprocess.call(["rm", tmp_image_filename])
+    gif_writer.close()
+
+    if optimizer == "gifsicle":
+        # Compress gif
+        print("\nStart compressing gif ...")
+        subprocess.call(["gifsicle",
+                         "-i", tmp_gif_filename,
+                         "-O3",
+                         "--colors", str(colors),
+                         "-o", output_gif_path])
+
+        # Delete tmp files
+        print("\nClean temporary files ...")
+        os.remove(tmp_gif_filename)
 
     # Print helper info
     print("\nDone!")
@@ -42,11 +42,14 @@ def parse_args():
 
 
 class ReadFromVideo(object):
-    def __init__(self, video_path, sample_interval=1):
+    def __init__(self, video_path, sample_interval=1, seek_threshold=30):
         ''' A video reader class for reading video frames from video.
         Arguments:
             video_path
             sample_interval {int}: sample every kth image.
+            seek_threshold {int}: If sample_interval >= seek_threshold,
+                jump to the next sampled frame by seeking. 
+                Otherwise, skip frames by grab() without retrieving them.
         '''
         if not os.path.exists(video_path):
             raise IOError("Video not exist: " + video_path)
@@ -56,7 +59,10 @@ class ReadFromVideo(object):
         self.video = cv2.VideoCapture(video_path)
         ret, frame = self.video.read()
         self.next_image = frame
+        self.next_frame_index = 0  # index of self.next_image in the video
+        self.curr_frame_index = -1  # index of the last returned image
         self.sample_interval = sample_interval
+        self.seek_threshold = seek_threshold
         self.fps = self.get_fps()
         if not self.fps >= 0.0001:
             import warnings
@@ -66,20 +72,47 @@ class ReadFromVideo(object):
         return self.next_image is not None
 
     def get_curr_video_time(self):
-        return 1.0 / self.fps * self.cnt_imgs
+        return 1.0 / self.fps * (self.curr_frame_index + 1)
 
     def read_image(self):
         image = self.next_image
-        for i in range(self.sample_interval):
-            if self.video.isOpened():
-                ret, frame = self.video.read()
-                self.next_image = frame
-            else:
-                self.next_image = None
-                break
+        self.curr_frame_index = self.next_frame_index
+        if self.sample_interval >= self.seek_threshold:
+            self._seek(self.next_frame_index + self.sample_interval)
+        else:
+            for i in range(self.sample_interval - 1):
+                self.video.grab()  # decode but don't retrieve the frame
+            self.next_frame_index += self.sample_interval
+        self.next_image = self._read_frame()
         self.cnt_imgs += 1
         return image
 
+    def seek_to_frame(self, frame_index):
+        ''' Make the next read_image() return the frame at frame_index. '''
+        self._seek(frame_index)
+        self.next_image = self._read_frame()
+
+    def seek_to_time(self, video_time):
+        ''' Make the next read_image() return the frame at video_time (seconds). '''
+        self.seek_to_frame(int(round(video_time * self.fps)))
+
+    def _seek(self, frame_index):
+        ''' Make the next self.video.read() return the frame at frame_index.
+        OpenCV seeks to the keyframe before it and only decodes from there,
+        instead of decoding all frames in between. '''
+        if not self.video.set(cv2.CAP_PROP_POS_FRAMES, frame_index):
+            # The backend can't seek. Skip frames one by one.
+            # After reading self.next_image, the video is at next_frame_index + 1.
+            for i in range(frame_index - self.next_frame_index - 1):
+                self.video.grab()
+        self.next_frame_index = frame_index
+
+    def _read_frame(self):
+        if self.video.isOpened():
+            ret, frame = self.video.read()
+            return frame
+        return None
+
     def stop(self):
         self.video.release()
         self.is_stoped = True
@@ -118,7 +151,7 @@ class ImageDisplayer(object):
 
 def main(args):
 
-    video_loader = ReadFromVideo(args.input_video_path)
+    video_loader = ReadFromVideo(args.input_video_path, args.sample_interval)
 
     if not os.path.exists(args.output_folder_path):
         os.makedirs(args.output_folder_path)
@@ -128,20 +161,18 @@ def main(args):
 
     img_displayer = ImageDisplayer()
     cnt_img = 0
-    for i in itertools.count():
+    while video_loader.has_image():
         img = video_loader.read_image()
-        if img is None:
-            print("Have read all frames from the video file.")
+        cnt_img += 1
+        print("Processing {}th image".format(cnt_img))
+        cv2.imwrite(set_output_filename(cnt_img), img)
+        img_displayer.display(img)
+        if cnt_img == args.max_frames:
+            print("Read {} frames. ".format(cnt_img) +
+                  "Reach the max_frames setting. Stop.")
             break
-        if i % args.sample_interval == 0:
-            cnt_img += 1
-            print("Processing {}th image".format(cnt_img))
-            cv2.imwrite(set_output_filename(cnt_img), img)
-            img_displayer.display(img)
-            if cnt_img == args.max_frames:
-                print("Read {} frames. ".format(cnt_img) +
-                      "Reach the max_frames setting. Stop.")
-                break
+    else:
+        print("Have read all frames from the video file.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+"""
+Extract pages from PDF files into new PDF files, based on a list of instructions.
+
+Each instruction line contains three parts:
+    1. Input PDF file name
+    2. Output PDF file name
+    3. The pages to extract, e.g., "1,2", "3-7", "1,4-6,9-end", or "1 2 3".
+       Pages are numbered from 1, and "end" is the last page.
+The input and output PDF file names are relative to the given directory.
+If the output file already exists, it will be overwritten.
+
+The instructions are grouped by the input file. Each input file is parsed only once,
+and all of its outputs are written from that parsed document.
+Different input files are processed in parallel.
+
+Usage:
+    python pdf_extract_pdfs_page.py <directory> <instructions.txt> [-w WORKERS]
+    # Use "-" to read the instructions from stdin.
+    # Empty lines and lines starting with '#' are ignored.
+
+Requirements:
+    pip install pypdf
+"""
+
+import argparse
+import os
+import re
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader, PdfWriter
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Extract pages from PDF files based on a list of instructions.")
+    parser.add_argument("directory", type=str)
+    parser.add_argument("instructions", type=str,
+                        help="A text file, or '-' for stdin. "
+                        "Each line: <input.pdf> <output.pdf> <pages>")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Number of input files processed at the same time.")
+    return parser.parse_args()
+
+
+def parse_instructions(text):
+    """Return [(input_pdf, output_pdf, pages_string)] from the lines of text."""
+    jobs = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split()
+        if len(parts) < 3:
+            print(f"Error: Invalid instruction: {line}")
+            continue
+        jobs.append((parts[0], parts[1], " ".join(parts[2:])))
+    return jobs
+
+
+def parse_pages(pages, num_pages):
+    """Convert a pages string like "1,4-6,9-end" into a list of 0-based page indices.
+    A range with start > end is extracted in reversed order, as in pdftk."""
+    indices = []
+    for token in re.split(r"[,\s]+", pages.strip()):
+        if not token:
+            continue
+        bounds = [num_pages if s == "end" else int(s) for s in token.split("-")]
+        if len(bounds) == 1:
+            bounds *= 2
+        if len(bounds) != 2 or not all(1 <= b <= num_pages for b in bounds):
+            raise ValueError(f"Invalid pages '{token}' for a PDF with {num_pages} pages")
+        start, end = bounds
+        step = 1 if end >= start else -1
+        indices.extend(range(start - 1, end - 1 + step, step))
+    return indices
+
+
+def extract_from_source(input_path, outputs):
+    """Parse input_path once, and write each (output_path, pages) in outputs.
+    Return a list of messages."""
+    if not os.path.isfile(input_path):
+        return [f"Error: Input file {input_path} does not exist."]
+    try:
+        reader = PdfReader(input_path)
+        num_pages = len(reader.pages)
+    except Exception as e:
+        return [f"Error: failed to read {input_path}: {e}"]
+
+    messages = []
+    for output_path, pages in outputs:
+        tmp_path = output_path + ".tmp"
+        try:
+            writer = PdfWriter()
+            for index in parse_pages(pages, num_pages):
+                writer.add_page(reader.pages[index])
+            with open(tmp_path, "wb") as f:
+                writer.write(f)
+            os.replace(tmp_path, output_path)
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            messages.append(f"Error: failed to create {output_path} from {input_path}: {e}")
+            continue
+        messages.append(f"Successfully created {output_path} from {input_path}.")
+    return messages
+
+
+def extract_pages(directory, jobs, workers=None):
+    # Group the jobs by the input file, keeping the order of the instructions
+    sources = OrderedDict()
+    for input_pdf, output_pdf, pages in jobs:
+        input_path = os.path.join(directory, input_pdf)
+        sources.setdefault(input_path, []).append(
+            (os.path.join(directory, output_pdf), pages))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(extract_from_source, input_path, outputs)
+                   for input_path, outputs in sources.items()]
+        for future in futures:
+            for message in future.result():
+                print(message)
+
+
+def main():
+    args = parse_args()
+    if args.instructions == "-":
+        jobs = parse_instructions(sys.stdin.read())
+    else:
+        with open(args.instructions) as f:
+            jobs = parse_instructions(f.read())
+    extract_pages(args.directory, jobs, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Resize all PDF files in a directory to A4 size, and merge them into one PDF file in name order.
+
+- The PDF files starting with 'out_' or 'resized_' are excluded.
+- Each PDF is resized by Ghostscript, with several Ghostscript processes running in parallel.
+- The resized PDFs are cached in '<pdf_dir>/.a4_cache/', named by the hash of the input
+  file and the Ghostscript settings. Rerunning after adding one file only resizes that file,
+  and no 'resized_*.pdf' files are written next to the inputs. Files with the same
+  content are resized once.
+- All resized PDFs are merged by one pdftk command.
+
+Output: '<pdf_dir>/resized_out_merged.pdf'.
+
+Usage:
+    python pdf_merge_pdfs_by_name_then_resize_to_a4.py [pdf_dir] [-w WORKERS]
+
+Requirements:
+    sudo apt-get install pdftk
+    sudo apt-get install ghostscript
+"""
+
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+GS_ARGS = [
+    "-sDEVICE=pdfwrite", "-dCompatibilityLevel=1.4", "-dPDFSETTINGS=/printer",
+    "-dFIXEDMEDIA", "-dPDFFitPage", "-sPAPERSIZE=a4",
+    "-dNOPAUSE", "-dQUIET", "-dBATCH",
+]
+EXCLUDED_PREFIXES = ("out_", "resized_")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Resize PDFs to A4 in parallel, and merge them by name.")
+    parser.add_argument("pdf_dir", type=str, nargs="?",
+                        default="/home/feiyu/Downloads/materials")
+    parser.add_argument("-o", "--output", type=str, default="out_merged.pdf",
+                        help="The merged file is saved as <pdf_dir>/resized_<output>.")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="Number of Ghostscript processes running at the same time.")
+    parser.add_argument("--cache-dir", type=str, default=None,
+                        help="Default: <pdf_dir>/.a4_cache")
+    return parser.parse_args()
+
+
+def list_pdf_files(pdf_dir):
+    """Return the sorted paths of PDF files, excluding the ones starting with 'out_' or 'resized_'."""
+    with os.scandir(pdf_dir) as entries:
+        return sorted(entry.path for entry in entries
+                      if entry.is_file() and entry.name.lower().endswith(".pdf")
+                      and not entry.name.startswith(EXCLUDED_PREFIXES))
+
+
+def hash_file(filename, chunk_size=1 << 20):
+    """Hash the file content, together with the Ghostscript settings."""
+    hasher = hashlib.sha256(" ".join(GS_ARGS).encode())
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def resize_to_a4(pdf_file, cached_file):
+    """Resize pdf_file to A4 into cached_file, unless it's already there.
+    Return cached_file, or None if Ghostscript failed."""
+    if os.path.exists(cached_file):
+        return cached_file
+    # A unique temporary file, so that resizing the same content twice at the same time
+    # (e.g. by two runs of this script) never writes into the same file
+    fd, tmp_file = tempfile.mkstemp(suffix=".pdf.tmp", dir=os.path.dirname(cached_file))
+    os.close(fd)
+    result = subprocess.run(["gs", *GS_ARGS, f"-sOutputFile={tmp_file}", pdf_file])
+    if result.returncode != 0:
+        os.remove(tmp_file)
+        return None
+    os.replace(tmp_file, cached_file)
+    return cached_file
+
+
+def merge_pdfs_resized_to_a4(pdf_dir, output="out_merged.pdf", workers=None, cache_dir=None):
+    pdf_files = list_pdf_files(pdf_dir)
+    if not pdf_files:
+        print("No PDF files to merge. Exiting.")
+        return None
+    cache_dir = cache_dir or os.path.join(pdf_dir, ".a4_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Resize each PDF to A4 size, in parallel
+    print("Resizing PDF files to A4 size...")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        cached_files = [os.path.join(cache_dir, file_hash + ".pdf")
+                        for file_hash in executor.map(hash_file, pdf_files)]
+        # Files with the same content are resized once
+        jobs = dict(zip(cached_files, pdf_files))
+        results = dict(zip(jobs, executor.map(resize_to_a4, jobs.values(), jobs.keys())))
+    resized_files = [results[cached_file] for cached_file in cached_files]
+    for pdf_file, resized_file in zip(pdf_files, resized_files):
+        if resized_file is None:
+            print(f"Failed to resize PDF file: {pdf_file}")
+    resized_files = [f for f in resized_files if f is not None]
+    if not resized_files:
+        print("No PDF files were resized successfully. Exiting.")
+        return None
+
+    # Merge resized PDF files
+    print("Merging resized PDF files...")
+    resized_output_path = os.path.join(pdf_dir, "resized_" + output)
+    result = subprocess.run(["pdftk", *resized_files, "cat", "output", resized_output_path])
+    if result.returncode != 0 or not os.path.isfile(resized_output_path):
+        print("PDF merging failed. Exiting.")
+        return None
+    print(f"PDFs resized to A4 size and merged. Output file: {resized_output_path}")
+    return resized_output_path
+
+
+def main():
+    args = parse_args()
+    if merge_pdfs_resized_to_a4(args.pdf_dir, args.output, args.workers, args.cache_dir) is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,92 @@
-from pdf2image import convert_from_path
+"""
+Convert each page of a PDF file to an image.
 
-# Path to the uploaded PDF file
-pdf_path = '/mnt/data/卖东西.pdf'
+The pages are split into chunks which are rendered on a pool of processes.
+Each chunk is rendered by one pdftoppm call, which writes the pages straight
+to disk, so the memory stays flat even for PDFs with hundreds of pages.
 
-# Convert each page of the PDF to an image
-images = convert_from_path(pdf_path)
+Usage:
+    python pdf_to_images.py /mnt/data/卖东西.pdf
+    python pdf_to_images.py scan.pdf -o pages/ --dpi 150 --fmt jpg --grayscale
+    python pdf_to_images.py scan.pdf --first-page 10 --last-page 20 --workers 4
 
-# Save each image as a separate file
-image_paths = []
-for i, image in enumerate(images):
-    image_path = f'/mnt/data/卖东西_page_{i+1}.png'
-    image.save(image_path, 'PNG')
-    image_paths.append(image_path)
+Requirements:
+    pip install pdf2image
+    sudo apt-get install poppler-utils
+"""
 
-image_paths
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+FORMATS = ["jpg", "png", "tiff"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert each page of a PDF to an image.")
+    parser.add_argument("pdf_path", type=str)
+    parser.add_argument("-o", "--output-dir", type=str, default=None,
+                        help="Default: the folder of the PDF.")
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--fmt", type=str, default="png", choices=FORMATS)
+    parser.add_argument("--grayscale", action="store_true")
+    parser.add_argument("--first-page", type=int, default=1)
+    parser.add_argument("--last-page", type=int, default=None,
+                        help="Default: the last page of the PDF.")
+    parser.add_argument("-w", "--workers", type=int, default=cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=8,
+                        help="Number of pages rendered by a worker per task.")
+    return parser.parse_args()
+
+
+def get_image_path(output_dir, pdf_path, page, fmt):
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    return os.path.join(output_dir, f"{stem}_page_{page}.{fmt}")
+
+
+def render_pages(pdf_path, first_page, last_page, output_dir, dpi, fmt, grayscale):
+    """Render pages [first_page, last_page] by one pdftoppm call into output_dir,
+    and rename the images to <name>_page_<page>.<fmt>."""
+    # The images are named by a random uuid, and returned in page order
+    paths = convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page,
+                              output_folder=output_dir, fmt=fmt, grayscale=grayscale,
+                              paths_only=True)
+    image_paths = []
+    for page, path in zip(range(first_page, last_page + 1), paths):
+        image_path = get_image_path(output_dir, pdf_path, page, fmt)
+        os.replace(path, image_path)
+        image_paths.append(image_path)
+    return image_paths
+
+
+def convert_pdf_to_images(pdf_path, output_dir=None, dpi=200, fmt="png", grayscale=False,
+                          first_page=1, last_page=None, workers=None, chunk_size=8):
+    """Render the page range of the PDF across worker processes.
+    Return the image paths in page order."""
+    output_dir = output_dir or os.path.dirname(os.path.abspath(pdf_path))
+    os.makedirs(output_dir, exist_ok=True)
+    num_pages = pdfinfo_from_path(pdf_path)["Pages"]
+    last_page = min(last_page or num_pages, num_pages)
+
+    chunks = [(start, min(start + chunk_size - 1, last_page))
+              for start in range(first_page, last_page + 1, chunk_size)]
+    image_paths = []
+    with ProcessPoolExecutor(max_workers=workers or cpu_count()) as pool:
+        futures = [pool.submit(render_pages, pdf_path, start, end,
+                               output_dir, dpi, fmt, grayscale)
+                   for start, end in chunks]
+        for (start, end), future in zip(chunks, futures):
+            image_paths.extend(future.result())
+            print(f"Saved pages {start}-{end} of {last_page}")
+    return image_paths
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    image_paths = convert_pdf_to_images(
+        args.pdf_path, args.output_dir, args.dpi, args.fmt, args.grayscale,
+        args.first_page, args.last_page, args.workers, args.chunk_size)
+    print(f"Converted {len(image_paths)} pages")
@@ -0,0 +1,255 @@
+"""
+Incremental photo pipeline: the steps in my_commands.sh, redoing only what changed.
+
+Steps:
+1. import: Copy the files of each source folder into the aggregate folder.
+   .HEIC files are converted to <prefix>_00001.jpg, <prefix>_00002.jpg, ...
+   (see convert_heic_to_jpg.py). The source files are kept.
+2. rename: Copy the images with a 'DateTimeOriginal' into '<aggregate>/result/',
+   named by the date and without metadata (see rename_files_with_image_creation_time.py).
+3. dummy_date: Copy the images without a 'DateTimeOriginal' into '<aggregate>/result/',
+   with dummy dates 1 second apart in the order of their names
+   (see set_dummy_date_for_sorted_image_files.py).
+
+A manifest '<aggregate>/.pipeline.sqlite' records the content hash of each file
+(recomputed only when its size or mtime changes), and the input hash, parameters
+and output of each file in each step. A step is skipped for a file if these
+haven't changed and its output still exists, so adding 50 photos to an album of
+20k photos only processes those 50 photos.
+The numbers of the converted .HEIC files and the base time of the dummy dates
+are also kept in the manifest, so the existing outputs keep their names and dates.
+(Except that the undated images after a new undated image in name order get new
+dummy dates, which keeps the dates in the order of the names.)
+
+Usage:
+    python photo_pipeline.py /home/feiyu/Downloads/汇总 \\
+        -s /home/feiyu/Downloads/1 day_1_2_ \\
+        -s /home/feiyu/Downloads/3 day_3_ \\
+        -s /home/feiyu/Downloads/4 day_4_5_
+
+Requirements:
+    heif-convert and exiftool must be installed and accessible in the system's PATH.
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from convert_heic_to_jpg import convert
+from lib_exiftool import ExifToolPool
+from rename_files_with_image_creation_time import get_image_mime_type, get_unique_filename
+from set_dummy_date_for_sorted_image_files import DATE_TAGS, IMAGE_EXTENSIONS
+
+MANIFEST_NAME = ".pipeline.sqlite"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Convert, collect and rename photos, redoing only what changed.")
+    parser.add_argument("aggregate_dir", type=str)
+    parser.add_argument("-s", "--source", nargs=2, action="append", default=[],
+                        metavar=("DIR", "PREFIX"),
+                        help="A source folder, and the prefix of its converted .HEIC files.")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    return parser.parse_args()
+
+
+def list_files(folder):
+    """Return the sorted paths of the files in the folder (not recursive), excluding hidden files."""
+    with os.scandir(folder) as entries:
+        return sorted(entry.path for entry in entries
+                      if entry.is_file() and not entry.name.startswith("."))
+
+
+class Manifest:
+    def __init__(self, filename):
+        self.db = sqlite3.connect(filename)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT);
+            CREATE TABLE IF NOT EXISTS stages (
+                stage TEXT, path TEXT, input_hash TEXT, params TEXT, output TEXT,
+                PRIMARY KEY (stage, path));
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+        """)
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def get_hashes(self, paths, workers=None):
+        """Return {path: sha256}. Only the files with a new size or mtime are read."""
+        stats = {path: os.stat(path) for path in paths}
+        hashes, to_hash = {}, []
+        for path, st in stats.items():
+            row = self.db.execute(
+                "SELECT size, mtime_ns, sha256 FROM file_hashes WHERE path = ?", (path,)).fetchone()
+            if row is not None and row[:2] == (st.st_size, st.st_mtime_ns):
+                hashes[path] = row[2]
+            else:
+                to_hash.append(path)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for path, sha256 in zip(to_hash, executor.map(hash_file, to_hash)):
+                hashes[path] = sha256
+                st = stats[path]
+                self.db.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)",
+                                (path, st.st_size, st.st_mtime_ns, sha256))
+        self.db.commit()
+        return hashes
+
+    def get_stage(self, stage, path):
+        """Return (input_hash, params, output) of the path in the stage, or None."""
+        return self.db.execute(
+            "SELECT input_hash, params, output FROM stages WHERE stage = ? AND path = ?",
+            (stage, path)).fetchone()
+
+    def is_done(self, stage, path, input_hash, params=""):
+        """Check if the stage was done with the same input and parameters, and its output exists."""
+        row = self.get_stage(stage, path)
+        return (row is not None and row[:2] == (input_hash, params)
+                and (not row[2] or os.path.exists(row[2])))
+
+    def set_stage(self, stage, path, input_hash, params, output):
+        self.db.execute("INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?)",
+                        (stage, path, input_hash, params, output))
+
+    def get_meta(self, name, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, name, value):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (name, str(value)))
+
+
+def hash_file(filename, chunk_size=1 << 20):
+    hasher = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def import_sources(manifest, sources, aggregate_dir, workers=None):
+    """Step 1. Copy or convert the files of the sources into the aggregate folder."""
+    jobs = []  # [(src, dst, input_hash, params)]
+    for src_dir, prefix in sources:
+        files = list_files(src_dir)
+        hashes = manifest.get_hashes(files, workers)
+        next_number_key = "next_number:" + os.path.abspath(src_dir)
+        next_number = int(manifest.get_meta(next_number_key, 1))
+        for src in files:
+            if manifest.is_done("import", src, hashes[src], prefix):
+                continue
+            if src.lower().endswith(".heic"):
+                # A file keeps its number. New files get new numbers, in the sorted order.
+                row = manifest.get_stage("import", src)
+                if row is not None and row[1] == prefix:
+                    dst = row[2]
+                else:
+                    dst = os.path.join(aggregate_dir, f"{prefix}_{next_number:05d}.jpg")
+                    next_number += 1
+            else:
+                dst = os.path.join(aggregate_dir, os.path.basename(src))
+            jobs.append((src, dst, hashes[src], prefix))
+        manifest.set_meta(next_number_key, next_number)
+
+    def run(job):
+        src, dst = job[:2]
+        if src.lower().endswith(".heic"):
+            return convert(src, dst)
+        shutil.copyfile(src, dst)
+        return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for (src, dst, input_hash, params), error in zip(jobs, executor.map(run, jobs)):
+            if error is not None:
+                print(f"Failed to convert {src}: {error}")
+                continue
+            manifest.set_stage("import", src, input_hash, params, dst)
+    manifest.db.commit()
+    print(f"import: {len(jobs)} files processed.")
+
+
+def rename_by_creation_time(manifest, aggregate_dir, exiftool_pool, workers=None):
+    """Step 2. Copy the dated images into result/, named by the date and without metadata.
+    Return the sorted paths of the images without a date."""
+    result_folder = os.path.join(aggregate_dir, "result")
+    os.makedirs(result_folder, exist_ok=True)
+    files = [f for f in list_files(aggregate_dir) if f.lower().endswith(IMAGE_EXTENSIONS)]
+    hashes = manifest.get_hashes(files, workers)
+
+    todo = [f for f in files if not manifest.is_done("rename", f, hashes[f])]
+    dates = exiftool_pool.read_dates(todo, ["DateTimeOriginal"])
+    todo.sort(key=lambda f: (dates[f].get("DateTimeOriginal") is None,
+                             dates[f].get("DateTimeOriginal") or 0, f))
+    renamed = []
+    for filepath in todo:
+        # The file has changed, so its old output is replaced.
+        row = manifest.get_stage("rename", filepath)
+        if row is not None and row[2] and os.path.exists(row[2]):
+            os.remove(row[2])
+        date = dates[filepath].get("DateTimeOriginal")
+        if date is None or get_image_mime_type(filepath) is None:
+            # Undated, or not an image: recorded with no output, and left to the next step.
+            manifest.set_stage("rename", filepath, hashes[filepath], "", "")
+            continue
+        extension = filepath.rsplit(".", 1)[-1].lower()
+        new_filename = get_unique_filename(
+            result_folder, date.strftime("%m-%d-%H-%M-%S"), extension)
+        result_path = os.path.join(result_folder, new_filename)
+        shutil.copyfile(filepath, result_path)
+        renamed.append(result_path)
+        manifest.set_stage("rename", filepath, hashes[filepath], "", result_path)
+
+    exiftool_pool.strip(renamed)
+    manifest.db.commit()
+    print(f"rename: {len(renamed)} files renamed.")
+    return [f for f in files if not manifest.get_stage("rename", f)[2]]
+
+
+def set_dummy_dates(manifest, aggregate_dir, undated_files, exiftool_pool):
+    """Step 3. Copy the undated images into result/, with dates 1 second apart in name order."""
+    result_folder = os.path.join(aggregate_dir, "result")
+    base_time = int(manifest.get_meta("dummy_base_time", int(time.time())))
+    manifest.set_meta("dummy_base_time", base_time)
+    hashes = manifest.get_hashes(undated_files)
+
+    file_dates = {}
+    for counter, filepath in enumerate(sorted(undated_files)):
+        timestamp = base_time + counter
+        if manifest.is_done("dummy_date", filepath, hashes[filepath], str(timestamp)):
+            continue
+        result_path = os.path.join(result_folder, os.path.basename(filepath))
+        shutil.copyfile(filepath, result_path)
+        file_dates[result_path] = time.strftime("%Y:%m:%d %H:%M:%S", time.localtime(timestamp))
+        manifest.set_stage("dummy_date", filepath, hashes[filepath], str(timestamp), result_path)
+
+    exiftool_pool.write_dates(file_dates, DATE_TAGS)
+    manifest.db.commit()
+    print(f"dummy_date: {len(file_dates)} files dated.")
+
+
+def run_pipeline(aggregate_dir, sources, workers=None):
+    os.makedirs(aggregate_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(aggregate_dir, MANIFEST_NAME))
+    try:
+        import_sources(manifest, sources, aggregate_dir, workers)
+        with ExifToolPool() as exiftool_pool:
+            undated_files = rename_by_creation_time(
+                manifest, aggregate_dir, exiftool_pool, workers)
+            set_dummy_dates(manifest, aggregate_dir, undated_files, exiftool_pool)
+    finally:
+        manifest.close()
+
+
+def main():
+    args = parse_args()
+    run_pipeline(args.aggregate_dir, args.source, args.workers)
+
+
+if __name__ == "__main__":
+    main()
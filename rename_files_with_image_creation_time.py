@@ -0,0 +1,115 @@
+"""
+Rename images by their original creation time.
+
+This does the same as the original rename_files_with_image_creation_time.sh, in one process:
+1. Reads 'DateTimeOriginal' of all images, and sorts them by it.
+2. Removes all metadata from the images except for the orientation information.
+3. Renames the images based on 'DateTimeOriginal' in the format 'MM-DD-HH-MM-SS',
+   appending '_01', '_02', ... to duplicated names.
+4. Moves the processed images into a subdirectory named "result" within the specified folder.
+5. Skips files which are not images (checked by their magic bytes),
+   or don't have a valid 'DateTimeOriginal'.
+The metadata is read and written by a pool of persistent exiftool processes,
+with one command per process for all images.
+
+Usage:
+    python rename_files_with_image_creation_time.py <folder_path>
+
+Requirements:
+    exiftool must be installed and accessible in the system's PATH.
+"""
+
+import os
+import sys
+
+from lib_exiftool import ExifToolPool
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff")
+
+# File signatures of the supported image types
+IMAGE_MAGIC_BYTES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+]
+
+def list_images(folder_path, extensions=IMAGE_EXTENSIONS):
+    """Return the names of files in the folder (not recursive) with the extensions."""
+    with os.scandir(folder_path) as entries:
+        return [entry.name for entry in entries
+                if entry.is_file() and entry.name.lower().endswith(extensions)]
+
+
+def get_image_mime_type(filepath):
+    """Return the MIME type of an image from its magic bytes, or None if not an image."""
+    with open(filepath, "rb") as f:
+        head = f.read(8)
+    for magic, mime_type in IMAGE_MAGIC_BYTES:
+        if head.startswith(magic):
+            return mime_type
+    return None
+
+
+def get_unique_filename(folder, name, extension):
+    """Return name.extension, or name_01.extension, ... which doesn't exist in the folder."""
+    new_filename = f"{name}.{extension}"
+    suffix = 1
+    while os.path.exists(os.path.join(folder, new_filename)):
+        new_filename = f"{name}_{suffix:02d}.{extension}"
+        suffix += 1
+    return new_filename
+
+
+def rename_files_with_image_creation_time(folder_path, exiftool_pool):
+    result_folder = os.path.join(folder_path, "result")
+    os.makedirs(result_folder, exist_ok=True)
+
+    # Read DateTimeOriginal of all images at once, and sort by it (then by filename)
+    filenames = list_images(folder_path)
+    filepaths = [os.path.join(folder_path, filename) for filename in filenames]
+    dates = exiftool_pool.read_dates(filepaths, ["DateTimeOriginal"])
+    entries = sorted(((dates[filepath].get("DateTimeOriginal"), filename)
+                      for filepath, filename in zip(filepaths, filenames)),
+                     key=lambda entry: (entry[0] is None, entry[0] or 0, entry[1]))
+    if not entries:
+        print(f"No image files with 'DateTimeOriginal' metadata found in '{folder_path}'.")
+        return
+
+    # Keep the images with a valid type and date
+    valid = []
+    for date, filename in entries:
+        filepath = os.path.join(folder_path, filename)
+        mime_type = get_image_mime_type(filepath)
+        if mime_type is None:
+            print(f"Skipping invalid or unsupported file: '{filename}'")
+            continue
+        if date is None:
+            print(f"Skipping file due to invalid DateTimeOriginal: '{filename}'")
+            continue
+        valid.append((filepath, filename, date))
+
+    # Remove all metadata except for Orientation
+    exiftool_pool.strip([filepath for filepath, _, _ in valid])
+
+    # Move the files to the result folder with the new names, in the sorted order
+    for filepath, filename, date in valid:
+        extension = filename.rsplit(".", 1)[-1].lower()
+        new_filename = get_unique_filename(
+            result_folder, date.strftime("%m-%d-%H-%M-%S"), extension)
+        os.rename(filepath, os.path.join(result_folder, new_filename))
+
+    print("Processed images by removing metadata (except orientation) "
+          "and renamed files based on original timestamps.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(f"Usage: {sys.argv[0]} <folder_path>")
+        sys.exit(1)
+    folder_path = sys.argv[1]
+    if not os.path.isdir(folder_path):
+        print(f"Error: '{folder_path}' is not a directory")
+        sys.exit(1)
+    with ExifToolPool() as exiftool_pool:
+        rename_files_with_image_creation_time(folder_path, exiftool_pool)
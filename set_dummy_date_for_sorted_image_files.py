@@ -0,0 +1,56 @@
+"""
+Set dummy dates for images in the order of their filenames.
+
+1. Sorts the images based on their filenames.
+2. Copies the images to a "result" subdirectory without modifying the original images.
+3. Sets the creation and modification dates of the images in the "result" folder.
+   - For the first image, sets the date to the current time.
+   - For subsequent images, increments the timestamp by 1 second for each image.
+The dates are written by a pool of persistent exiftool processes.
+
+Usage:
+    python set_dummy_date_for_sorted_image_files.py <folder_path>
+
+Requirements:
+    exiftool must be installed and accessible in the system's PATH.
+"""
+
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+from lib_exiftool import ExifToolPool
+from rename_files_with_image_creation_time import list_images
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".gif", ".bmp", ".heic")
+DATE_TAGS = ["FileModifyDate", "FileCreateDate", "ModifyDate", "DateTimeOriginal"]
+
+
+def set_dummy_date_for_sorted_image_files(folder_path, exiftool_pool, start_time=None):
+    result_folder = os.path.join(folder_path, "result")
+    os.makedirs(result_folder, exist_ok=True)
+    start_time = int(time.time()) if start_time is None else start_time
+
+    # Copy the files to the result folder, and give each 1 second more than the previous one
+    file_dates = {}
+    for counter, filename in enumerate(sorted(list_images(folder_path, IMAGE_EXTENSIONS))):
+        result_path = os.path.join(result_folder, filename)
+        shutil.copyfile(os.path.join(folder_path, filename), result_path)
+        file_dates[result_path] = datetime.fromtimestamp(start_time + counter)
+
+    exiftool_pool.write_dates(file_dates, DATE_TAGS)
+    print(f"Processed images with updated timestamps in '{result_folder}'.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(f"Usage: {sys.argv[0]} <folder_path>")
+        sys.exit(1)
+    folder_path = sys.argv[1]
+    if not os.path.isdir(folder_path):
+        print(f"Error: '{folder_path}' is not a directory")
+        sys.exit(1)
+    with ExifToolPool() as exiftool_pool:
+        set_dummy_date_for_sorted_image_files(folder_path, exiftool_pool)
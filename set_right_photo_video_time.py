@@ -0,0 +1,55 @@
+"""
+Set the modification time of photos and videos to the time in their metadata.
+
+It's designed to correct timestamps for items downloaded from iCloud Photos.
+Images use 'DateTimeOriginal', and videos use 'CreateDate'.
+Note: This only works for camera photos, camera videos, and screenshots.
+Images from other sources, like web downloads, are not supported.
+
+The metadata of all files is read by a pool of persistent exiftool processes,
+and the file times are set in-process.
+
+Usage:
+    python set_right_photo_video_time.py /path/to/media/directory
+
+Requirements:
+    exiftool must be installed and accessible in the system's PATH.
+"""
+
+import os
+import sys
+import time
+
+from lib_exiftool import ExifToolPool
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi")
+
+
+def set_right_photo_video_time(media_dir, exiftool_pool):
+    with os.scandir(media_dir) as entries:
+        files = sorted(entry.path for entry in entries if entry.is_file())
+    videos = [file for file in files if file.lower().endswith(VIDEO_EXTENSIONS)]
+    images = [file for file in files if not file.lower().endswith(VIDEO_EXTENSIONS)]
+
+    for media_files, tag, is_video in [(images, "DateTimeOriginal", False),
+                                       (videos, "CreateDate", True)]:
+        dates = exiftool_pool.read_dates(media_files, [tag])
+        for file in media_files:
+            date = dates[file].get(tag)
+            if date is not None:
+                # Same as `touch -t`: set both access and modification times, in local time
+                timestamp = time.mktime(date.timetuple())
+                os.utime(file, (timestamp, timestamp))
+                print(f"Successfully updated timestamp for {'video' if is_video else 'image'} {file}")
+            elif is_video:
+                print(f"No metadata for video {file}")
+            else:
+                print(f"No EXIF data for image {file}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or not sys.argv[1]:
+        print("Please provide a directory.")
+        sys.exit(1)
+    with ExifToolPool() as exiftool_pool:
+        set_right_photo_video_time(sys.argv[1], exiftool_pool)
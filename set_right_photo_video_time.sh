@@ -13,55 +13,8 @@
 #
 # Usage:
 # ./this_script.sh /path/to/media/directory
+#
+# The work is done by set_right_photo_video_time.py, which reads the dates of all files
+# with a pool of persistent exiftool processes and sets the file times in-process.
 
-# Directory containing the media (passed as the first argument)
-MEDIA_DIR="$1"
-
-# Check if MEDIA_DIR is provided
-if [ -z "$MEDIA_DIR" ]; then
-    echo "Please provide a directory."
-    exit 1
-fi
-
-# Function to extract datetime and update file timestamp
-update_timestamp() {
-    local file=$1
-    local is_video=$2
-    local datetime_tag="DateTimeOriginal"
-
-    # If the file is a video, use the 'CreateDate' tag instead
-    if [ "$is_video" == true ]; then
-        datetime_tag="CreateDate"
-    fi
-
-    datetime=$(exiftool -$datetime_tag -d "%Y%m%d%H%M.%S" "$file" | awk -F': ' '{print $2}')
-    
-    if [ ! -z "$datetime" ]; then
-        touch -t "$datetime" "$file"
-        if [ "$is_video" == true ]; then
-            echo "Successfully updated timestamp for video $file"
-        else
-            echo "Successfully updated timestamp for image $file"
-        fi
-    else
-        if [ "$is_video" == false ]; then
-            echo "No EXIF data for image $file"
-        else
-            echo "No metadata for video $file"
-        fi
-    fi
-}
-
-# Loop over each file in the directory
-for file in "$MEDIA_DIR"/*; do
-    if [[ -f "$file" ]]; then
-        # Check if the file is a common video format
-        if [[ "$file" == *.mp4 || "$file" == *.MP4 || "$file" == *.mov || "$file" == *.MOV || "$file" == *.avi || "$file" == *.AVI ]]; then
-            # Handle video file
-            update_timestamp "$file" true
-        else
-            # Handle image file
-            update_timestamp "$file" false
-        fi
-    fi
-done
+exec python3 "$(dirname "$0")/set_right_photo_video_time.py" "$@"